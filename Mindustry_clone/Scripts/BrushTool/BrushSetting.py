@@ -1,44 +1,60 @@
+import bisect
+import functools
+
 import pygame.event
 
 from Scripts.Engine.Editor import *
 
-def _bucket_fill(arr: np.ndarray, index: tuple[int, int]) -> list[tuple[int, int]]:
+def _bucket_fill(arr: np.ndarray, index: tuple[int, int]) -> np.ndarray:
     """
     Bucket filling algorithm.
+    Cells of the same value are grouped into runs along the second axis with array operations,
+    then the runs connected to the target index are visited, so the cost is linear in the array size.
 
     :param arr: An 2D array
     :param index: Target index
-    :return: A list of the same index values of group indices
+    :return: A boolean mask of the same index values of group indices
     """
-    direction: list[tuple[int, int]] = [(1, 0), (-1, 0), (0, 1), (0, -1)]
     col: int = arr.shape[0]
     row: int = arr.shape[1]
 
-    value = arr[index[0]][index[1]]
-
-    is_stop: bool = False
-    group: list = [index]
-
-    visited_group: list = [index]
-    while not is_stop:
-        is_stop = True
-        new_visited_group: list = []
-        for current_index in visited_group:
-            X, Y = current_index
-            for dx, dy in direction:
-                x, y = X + dx, Y + dy
-                if not 0 <= x < col or not 0 <= y < row:
-                    continue
-                if arr[x][y] == value:
-                    if (x, y) in group:
-                        continue
-
-                    new_visited_group.append((x, y))
-                    group.append((x, y))
-                    is_stop = False
-
-        visited_group = new_visited_group
-    return group
+    # Runs of the target value, in row-major order
+    region = np.zeros((col, row + 2), dtype=np.int8)
+    region[:, 1:-1] = arr == arr[index[0]][index[1]]
+    edge = np.diff(region, axis=1)
+    run_x, run_start = np.nonzero(edge == 1)
+    run_end = np.nonzero(edge == -1)[1]
+    row_offset: list[int] = np.searchsorted(run_x, np.arange(col + 1)).tolist()
+    starts: list[int] = run_start.tolist()
+    ends: list[int] = run_end.tolist()
+
+    # Run holding the target index
+    lo, hi = row_offset[index[0]], row_offset[index[0] + 1]
+    seed = bisect.bisect_right(starts, index[1], lo, hi) - 1
+
+    visited = np.zeros(len(starts), dtype=bool)
+    visited[seed] = True
+    visited_group: list[tuple[int, int]] = [(index[0], seed)]
+    while visited_group:
+        X, run = visited_group.pop()
+        start, end = starts[run], ends[run]
+        for x in (X - 1, X + 1):
+            if not 0 <= x < col:
+                continue
+            # Runs of the neighbour row overlapping [start, end)
+            lo, hi = row_offset[x], row_offset[x + 1]
+            first = bisect.bisect_right(ends, start, lo, hi)
+            last = bisect.bisect_left(starts, end, first, hi)
+            for neighbour_run in range(first, last):
+                if not visited[neighbour_run]:
+                    visited[neighbour_run] = True
+                    visited_group.append((x, neighbour_run))
+
+    # Paint the visited runs back into a mask
+    group = np.zeros((col, row + 1), dtype=np.int8)
+    group[run_x[visited], run_start[visited]] = 1
+    group[run_x[visited], run_end[visited]] = -1
+    return np.cumsum(group, axis=1)[:, :row] > 0
 
 # Pen head lists
 pen1 = np.array([
@@ -94,11 +110,56 @@ pen6 = np.array([
     [0, 0, 0, 0, 1, 1, 1, 0, 0, 0, 0],
 ])
 
+pen_list: list[np.ndarray] = [pen1, pen2, pen3, pen4, pen5, pen6]
+
+@functools.lru_cache(maxsize=None)
+def _pen_head_offsets(pen_head_size: int) -> np.ndarray:
+    """
+    Return the (x, y) offsets of the pen head cells from its center.
+    Sizes 2 to 7 use the pen head lists, larger sizes are generated as a circle.
+
+    :param pen_head_size: Pen head size
+    :return: An (N, 2) offset array
+    """
+    if pen_head_size <= 1:
+        return np.zeros((1, 2), dtype=np.intp)
+
+    if pen_head_size - 2 < len(pen_list):
+        pen = pen_list[pen_head_size - 2]
+        x, y = np.nonzero(pen)
+        offsets = np.stack((y - pen.shape[0] // 2, x - pen.shape[1] // 2), axis=1)
+    else:
+        radius = pen_head_size - 2
+        x, y = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        inside = x ** 2 + y ** 2 <= radius ** 2 + radius
+        offsets = np.stack((x[inside], y[inside]), axis=1)
+
+    offsets = offsets.astype(np.intp)
+    offsets.flags.writeable = False
+    return offsets
+
+def _line_indices(start: tuple[int, int], end: tuple[int, int]) -> np.ndarray:
+    """
+    Rasterize the line between two indices.
+
+    :param start: Start index
+    :param end: End index
+    :return: An (N, 2) index array from start to end
+    """
+    length = max(abs(end[0] - start[0]), abs(end[1] - start[1])) + 1
+    t = np.linspace(0.0, 1.0, length)
+    x = np.rint(start[0] + t * (end[0] - start[0]))
+    y = np.rint(start[1] + t * (end[1] - start[1]))
+    return np.stack((x, y), axis=1).astype(np.intp)
+
 class BrushTool:
     def __init__(self):
-        self.__pen_list = [pen1, pen2, pen3, pen4, pen5, pen6]
         self.__pen_head_size: int = 1
 
+        # Draw the line between the previous and current index while the mouse is held
+        self.stroke_mode: bool = True
+        self.__previous_index: tuple[int, int] | None = None
+
         self.index_selected: tuple[int, int] | None = None
         self.brush_current: str = ""
         self.block_current: Block | None = None
@@ -106,27 +167,26 @@ class BrushTool:
         # Handle on-off the brush copy
         self.is_holding_copy_brush: bool = False
 
-    def __get_pen_index_circle_area(self, index_center: tuple[int, int]) -> list[tuple[int, int]]:
+    def __get_pen_index_circle_area(self, index_center: tuple[int, int], world_size: tuple[int, int]) -> np.ndarray:
         """
-        Return a list of indices area corresponds to its current pen size.
-        This method automatically remove negative indices
+        Return an array of indices area corresponds to its current pen size.
+        In stroke mode the area covers the whole line from the previous index.
+        This method automatically remove indices out of the world.
 
         :param index_center: center point of index
-        :return: An area of the list of indices where the pen brush has filled
+        :param world_size: World size
+        :return: An (N, 2) array of indices where the pen brush has filled
         """
-        if self.__pen_head_size == 1:
-            return [index_center]
-
-        __pen_head_size = self.__pen_list[self.__pen_head_size - 2]
-        index_list = []
-        for x in range(__pen_head_size.shape[0]):
-            for y in range(__pen_head_size.shape[1]):
-                if __pen_head_size[x][y]:
-                    i = (y - __pen_head_size.shape[0] // 2 + index_center[0], x - __pen_head_size.shape[1] // 2 + index_center[1])
-                    if i[0] < 0 or i[1] < 0:
-                        continue
-                    index_list.append(i)
-        return index_list
+        if self.stroke_mode and self.__previous_index is not None:
+            centers = _line_indices(self.__previous_index, index_center)
+        else:
+            centers = np.array([index_center], dtype=np.intp)
+        self.__previous_index = index_center
+
+        index_array = (centers[:, np.newaxis, :] + _pen_head_offsets(self.__pen_head_size)).reshape(-1, 2)
+        inside = ((index_array[:, 0] >= 0) & (index_array[:, 0] < world_size[0]) &
+                  (index_array[:, 1] >= 0) & (index_array[:, 1] < world_size[1]))
+        return index_array[inside]
 
     def __pen_draw(self, layer: Layer):
         """
@@ -135,15 +195,11 @@ class BrushTool:
         :param layer: Current layer
         """
         if self.index_selected == (None, None):
+            self.__previous_index = None
             return
 
-        index_list = self.__get_pen_index_circle_area(self.index_selected)
-        if self.block_current is None:
-            for i in index_list:
-                layer.remove(i)
-        else:
-            for i in index_list:
-                layer.add(i, self.block_current)
+        index_array = self.__get_pen_index_circle_area(self.index_selected, layer.index_position.shape)
+        layer.apply_indices(index_array, self.block_current)
 
     def __pen_erase(self, layer: Layer):
         """
@@ -152,11 +208,11 @@ class BrushTool:
         :param layer: Current layer
         """
         if self.index_selected == (None, None):
+            self.__previous_index = None
             return
 
-        index_list = self.__get_pen_index_circle_area(self.index_selected)
-        for i in index_list:
-            layer.remove(i)
+        index_array = self.__get_pen_index_circle_area(self.index_selected, layer.index_position.shape)
+        layer.apply_indices(index_array, None)
 
     def change_pen_head_size(self, event: pygame.event.Event):
         """
@@ -168,31 +224,33 @@ class BrushTool:
         if event.key == pygame.K_1:
             self.__pen_head_size = 1
             debug.event_update(f'Pen head size: {self.__pen_head_size}')
-            camera.screen_update = True
         elif event.key == pygame.K_2:
             self.__pen_head_size = 2
             debug.event_update(f'Pen head size: {self.__pen_head_size}')
-            camera.screen_update = True
         elif event.key == pygame.K_3:
             self.__pen_head_size = 3
             debug.event_update(f'Pen head size: {self.__pen_head_size}')
-            camera.screen_update = True
         elif event.key == pygame.K_4:
             self.__pen_head_size = 4
             debug.event_update(f'Pen head size: {self.__pen_head_size}')
-            camera.screen_update = True
         elif event.key == pygame.K_5:
             self.__pen_head_size = 5
             debug.event_update(f'Pen head size: {self.__pen_head_size}')
-            camera.screen_update = True
         elif event.key == pygame.K_6:
             self.__pen_head_size = 6
             debug.event_update(f'Pen head size: {self.__pen_head_size}')
-            camera.screen_update = True
         elif event.key == pygame.K_7:
             self.__pen_head_size = 7
             debug.event_update(f'Pen head size: {self.__pen_head_size}')
-            camera.screen_update = True
+        elif event.key == pygame.K_EQUALS:
+            self.__pen_head_size = min(self.__pen_head_size + 1, PEN_HEAD_SIZE_MAX)
+            debug.event_update(f'Pen head size: {self.__pen_head_size}')
+        elif event.key == pygame.K_MINUS:
+            self.__pen_head_size = max(self.__pen_head_size - 1, 1)
+            debug.event_update(f'Pen head size: {self.__pen_head_size}')
+        elif event.key == pygame.K_l:
+            self.stroke_mode = not self.stroke_mode
+            debug.event_update(f'Stroke mode: {"on" if self.stroke_mode else "off"}')
 
     def __fill(self, layer: Layer):
         """
@@ -203,13 +261,8 @@ class BrushTool:
         if self.index_selected == (None, None):
             return
 
-        index_list = _bucket_fill(layer.index_position, self.index_selected)
-        if self.block_current is None:
-            for i in index_list:
-                layer.remove(i)
-        else:
-            for i in index_list:
-                layer.add(i, self.block_current)
+        mask = _bucket_fill(layer.index_position, self.index_selected)
+        layer.apply_mask(mask, self.block_current)
 
     def __copy_block(self, layer: Layer):
         """
@@ -225,7 +278,7 @@ class BrushTool:
             debug.event_update('Copied \'None\'')
         else:
             # Copy current block data
-            block = layer.sprite_dict[self.index_selected]
+            block = block_dict[int(layer.index_position[self.index_selected[0]][self.index_selected[1]])]
             self.block_current = block
             debug.event_update(f'Copied \'{block.name}\'')
 
@@ -240,6 +293,30 @@ class BrushTool:
             self.brush_current = 'pen'
             camera.screen_update = True
 
+    def use_brush(self, layer: Layer):
+        """
+        Use the current brush at 'self.index_selected'.
+
+        :param layer: Current layer
+        """
+        if self.brush_current == 'pen':
+            self.__pen_draw(layer)
+        elif self.brush_current == 'erase':
+            self.__pen_erase(layer)
+        elif self.brush_current == 'fill':
+            self.__fill(layer)
+        elif self.brush_current == 'copy':
+            if self.is_holding_copy_brush:
+                self.__copy_block(layer)
+
+    def end_stroke(self):
+        """
+        Finish the current stroke, the next pen index is not connected to the previous one.
+        The edits of the stroke are undone together.
+        """
+        self.__previous_index = None
+        edit_history.end_step()
+
     def paint(self, layer: Layer):
         """
         Paint block on the layer corresponds to brush type.
@@ -248,16 +325,9 @@ class BrushTool:
         """
         mouses = pygame.mouse.get_pressed()
         if mouses[0]:
-            if self.brush_current == 'pen':
-                self.__pen_draw(layer)
-            elif self.brush_current == 'erase':
-                self.__pen_erase(layer)
-            elif self.brush_current == 'fill':
-                self.__fill(layer)
-            elif self.brush_current == 'copy':
-                if self.is_holding_copy_brush:
-                    self.__copy_block(layer)
+            self.use_brush(layer)
         else:
+            self.end_stroke()
             if self.brush_current == 'copy':
                 self.__change_brush_type()
 
@@ -1,21 +0,0 @@
-from Mindustry_clone.Scripts.Engine.Editor import Block
-
-Grass = Block('Images/Block_Images/Grass_001.png')
-Grass.name = 'Grass'
-Grass.id = 1
-
-Rock = Block('Images/Block_Images/Rock_002.png')
-Rock.name = 'Rock'
-Rock.id = 2
-
-Sand = Block('Images/Block_Images/Sand_003.png')
-Sand.name = 'Sand'
-Sand.id = 3
-
-Water = Block('Images/Block_Images/Water_004.png')
-Water.name = 'Water'
-Water.id = 4
-
-block_list = [
-    Grass, Rock, Sand, Water,
-]
\ No newline at end of file
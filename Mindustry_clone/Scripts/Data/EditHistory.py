@@ -0,0 +1,143 @@
+from collections import deque
+
+import numpy as np
+
+
+def _encode_index_runs(indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Run-length encode sorted flat cell indices as runs of consecutive indices.
+
+    :param indices: Sorted unique flat indices
+    :return: Run start indices and run lengths
+    """
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    lengths = np.diff(np.concatenate((starts, [len(indices)])))
+    return indices[starts].astype(np.int64), lengths.astype(np.uint32)
+
+
+def _decode_index_runs(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    run_offsets = np.cumsum(lengths, dtype=np.int64) - lengths
+    return np.arange(int(lengths.sum()), dtype=np.int64) - np.repeat(run_offsets - starts, lengths)
+
+
+def _encode_value_runs(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Run-length encode block ids as runs of equal ids.
+
+    :param values: Block ids
+    :return: Run block ids and run lengths
+    """
+    starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+    lengths = np.diff(np.concatenate((starts, [len(values)])))
+    return values[starts], lengths.astype(np.uint32)
+
+
+class CellDelta:
+    def __init__(self, target, indices: np.ndarray, old_ids: np.ndarray, new_ids: np.ndarray):
+        """
+        Cells changed by one edit, stored as runs. A fill over a region of one block is a few runs
+        however many cells it changed.
+
+        :param target: Edited object, with a 'set_cells(indices, ids)' method
+        :param indices: Flat indices of the changed cells
+        :param old_ids: Block ids before the edit
+        :param new_ids: Block ids after the edit
+        """
+        order = np.argsort(indices, kind='stable')
+        self.target = target
+        self.index_runs: tuple[np.ndarray, np.ndarray] = _encode_index_runs(indices[order])
+        self.old_runs: tuple[np.ndarray, np.ndarray] = _encode_value_runs(old_ids[order])
+        self.new_runs: tuple[np.ndarray, np.ndarray] = _encode_value_runs(new_ids[order])
+        self.memory: int = sum(array.nbytes for runs in (self.index_runs, self.old_runs, self.new_runs) for array in runs)
+
+    def undo(self):
+        self.target.set_cells(_decode_index_runs(*self.index_runs), np.repeat(*self.old_runs))
+
+    def redo(self):
+        self.target.set_cells(_decode_index_runs(*self.index_runs), np.repeat(*self.new_runs))
+
+
+class EditHistory:
+    def __init__(self, max_memory: int):
+        """
+        Undo and redo steps. Every edit recorded until 'end_step' is undone together.
+        The oldest steps are dropped when the history takes more than 'max_memory' bytes.
+
+        :param max_memory: Maximum bytes of recorded deltas
+        """
+        self.max_memory: int = max_memory
+        self.memory: int = 0
+        self.__undo_steps: deque[list[CellDelta]] = deque()
+        self.__redo_steps: list[list[CellDelta]] = []
+        self.__step: list[CellDelta] = []
+
+    def record(self, target, indices: np.ndarray, old_ids: np.ndarray, new_ids: np.ndarray):
+        """
+        Record changed cells into the current step. Recording a new edit clears the redo steps.
+
+        :param target: Edited object, with a 'set_cells(indices, ids)' method
+        :param indices: Flat indices of the changed cells
+        :param old_ids: Block ids before the edit
+        :param new_ids: Block ids after the edit, or one id for every cell
+        """
+        if not len(indices):
+            return
+
+        new_ids = np.broadcast_to(np.asarray(new_ids, dtype=old_ids.dtype), old_ids.shape)
+        self.__step.append(CellDelta(target, np.asarray(indices), old_ids, new_ids))
+        for step in self.__redo_steps:
+            self.memory -= sum(delta.memory for delta in step)
+        self.__redo_steps.clear()
+
+    def end_step(self):
+        """
+        Close the current step, so the next edit is undone separately.
+        """
+        if not self.__step:
+            return
+
+        self.__undo_steps.append(self.__step)
+        self.memory += sum(delta.memory for delta in self.__step)
+        self.__step = []
+
+        while self.memory > self.max_memory and len(self.__undo_steps) > 1:
+            self.memory -= sum(delta.memory for delta in self.__undo_steps.popleft())
+
+    def undo(self) -> bool:
+        """
+        Revert the last step.
+
+        :return: False if there is nothing to undo
+        """
+        self.end_step()
+        if not self.__undo_steps:
+            return False
+
+        step = self.__undo_steps.pop()
+        for delta in reversed(step):
+            delta.undo()
+        self.__redo_steps.append(step)
+        return True
+
+    def redo(self) -> bool:
+        """
+        Apply the last undone step again.
+
+        :return: False if there is nothing to redo
+        """
+        self.end_step()
+        if not self.__redo_steps:
+            return False
+
+        step = self.__redo_steps.pop()
+        for delta in step:
+            delta.redo()
+        self.__undo_steps.append(step)
+        return True
+
+    def clear(self):
+        self.__undo_steps.clear()
+        self.__redo_steps.clear()
+        self.__step = []
+        self.memory = 0
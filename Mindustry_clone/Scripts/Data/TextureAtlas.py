@@ -0,0 +1,139 @@
+import hashlib
+import json
+import math
+import os
+
+import pygame
+
+# Cache layout, in the cache directory:
+#   <prefix>_<key>.png   packed atlas image
+#   <prefix>_<key>.json  image paths and their rect (x, y, w, h) in the atlas
+# The key is a hash of every source image path and content, a changed image gives a new key.
+ATLAS_CACHE_VERSION: int = 1
+ATLAS_MAX_WIDTH: int = 2048  # Rows of images are packed up to this width
+ATLAS_PADDING: int = 1  # Empty pixels between images
+
+
+class TextureAtlas:
+    def __init__(self, surface: pygame.Surface, rect_list: list[pygame.Rect]):
+        """
+        Images packed into one surface.
+
+        :param surface: Atlas surface
+        :param rect_list: Area of each image in the atlas, in source order
+        """
+        self.surface: pygame.Surface = surface
+        self.rect_list: list[pygame.Rect] = rect_list
+
+    def subsurface(self, index: int) -> pygame.Surface:
+        """
+        :param index: Image index in source order
+        :return: Image sharing the atlas pixels
+        """
+        return self.surface.subsurface(self.rect_list[index])
+
+
+def atlas_key(image_paths: list) -> str:
+    """
+    Hash the image paths and the content of the image files.
+
+    :param image_paths: Source image file paths
+    :return: Hex digest
+    """
+    digest = hashlib.sha1(str(ATLAS_CACHE_VERSION).encode())
+    for image_path in image_paths:
+        with open(image_path, 'rb') as file:
+            file_digest = hashlib.sha1(file.read()).digest()
+        digest.update(os.fsencode(image_path) + b'\0' + file_digest)
+    return digest.hexdigest()
+
+
+def pack_rects(size_list: list[tuple[int, int]], max_width: int = ATLAS_MAX_WIDTH,
+               padding: int = ATLAS_PADDING) -> tuple[list[pygame.Rect], tuple[int, int]]:
+    """
+    Place the sizes in rows from the tallest to the shortest.
+
+    :param size_list: Image sizes
+    :param max_width: Maximum atlas width, wider images get a row of their own
+    :param padding: Empty pixels between images
+    :return: Rect of each size in input order and the atlas size
+    """
+    rect_list = [pygame.Rect(0, 0, w, h) for w, h in size_list]
+    x, y, row_height, width = 0, 0, 0, 0
+    for i in sorted(range(len(size_list)), key=lambda i: -size_list[i][1]):
+        rect = rect_list[i]
+        if x and x + rect.w > max_width:
+            x, y, row_height = 0, y + row_height + padding, 0
+        rect.topleft = (x, y)
+        x += rect.w + padding
+        row_height = max(row_height, rect.h)
+        width = max(width, rect.right)
+    return rect_list, (max(1, width), max(1, y + row_height))
+
+
+def build_atlas(image_paths: list) -> TextureAtlas:
+    """
+    Decode and pack the images into one atlas.
+
+    :param image_paths: Source image file paths
+    :return: Atlas, not converted to the screen format
+    """
+    image_list = [pygame.image.load(image_path) for image_path in image_paths]
+    rect_list, size = pack_rects([image.get_size() for image in image_list])
+
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    surface.fill((0, 0, 0, 0))
+    surface.blits([(image, rect) for image, rect in zip(image_list, rect_list)], doreturn=False)
+    return TextureAtlas(surface, rect_list)
+
+
+def load_atlas(image_paths: list, cache_dir, prefix: str = 'atlas') -> TextureAtlas:
+    """
+    Load the packed atlas from the cache directory, or pack the images and cache the atlas.
+    Only one image is decoded when the cache is valid. Outdated atlases with the same prefix are removed.
+
+    :param image_paths: Source image file paths
+    :param cache_dir: Cache directory, created if missing
+    :param prefix: Cache file name prefix
+    :return: Atlas, not converted to the screen format
+    """
+    image_paths = [os.fspath(image_path) for image_path in image_paths]
+    key = atlas_key(image_paths)
+    image_path = os.path.join(cache_dir, f'{prefix}_{key}.png')
+    table_path = os.path.join(cache_dir, f'{prefix}_{key}.json')
+
+    try:
+        with open(table_path) as file:
+            table = json.load(file)
+        if table['images'] == image_paths:
+            return TextureAtlas(pygame.image.load(image_path), [pygame.Rect(rect) for rect in table['rects']])
+    except (OSError, ValueError, KeyError, pygame.error):
+        pass
+
+    atlas = build_atlas(image_paths)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for file_name in os.listdir(cache_dir):
+            if file_name.startswith(f'{prefix}_') and not file_name.startswith(f'{prefix}_{key}'):
+                os.remove(os.path.join(cache_dir, file_name))
+
+        # Written next to the target and renamed, the table last so a partial cache is never used
+        temporary_path = f'{image_path}.{os.getpid()}.png'
+        pygame.image.save(atlas.surface, temporary_path)
+        os.replace(temporary_path, image_path)
+        with open(f'{table_path}.{os.getpid()}', 'w') as file:
+            json.dump({'images': image_paths, 'rects': [list(rect) for rect in atlas.rect_list]}, file)
+        os.replace(f'{table_path}.{os.getpid()}', table_path)
+    except (OSError, pygame.error):
+        # The cache only speeds up the next start
+        pass
+    return atlas
+
+
+def grid_size(count: int) -> tuple[int, int]:
+    """
+    :param count: Number of cells
+    :return: Columns and rows of the smallest square-ish grid holding the cells
+    """
+    columns = max(1, math.ceil(math.sqrt(count)))
+    return columns, max(1, -(-count // columns))
@@ -0,0 +1,259 @@
+import bz2
+import lzma
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from Scripts.Data.WorldFile import WorldFile, block_id_dtype, is_world_file, read_csv, read_world, \
+    _pack_block_table, _read_block_table, _DTYPE_CODE
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Archive layout:
+#   header      magic, version, world size, layer count, dtype code, block count, codec code, chunk size,
+#               chunk table offset, chunk table size
+#   block table (id, name length, name) for each block type
+#   chunk data, each chunk is its raw cells in C order compressed on its own. Empty chunks have no data.
+#   chunk table (offset, compressed size) of every chunk, layer by layer, chunks in (cx, cy) order, zlib compressed
+WORLD_ARCHIVE_MAGIC: bytes = b'MWAR'
+WORLD_ARCHIVE_VERSION: int = 1
+ARCHIVE_CHUNK_SIZE: int = 64  # Cells per archive chunk side, large enough to compress well
+ARCHIVE_THREADS: int = os.cpu_count() or 1  # The codecs release the GIL, chunks are compressed in parallel
+
+_HEADER = struct.Struct('<4sHIIHBHBHQI')
+_CHUNK_ENTRY = np.dtype([('offset', '<u8'), ('size', '<u4')])
+
+
+_CODEC_CODE: dict[str, int] = {'none': 0, 'zlib': 1, 'bz2': 2, 'lzma': 3, 'zstd': 4}
+
+
+class _Codec:
+    def __init__(self, compress, decompress, default_level: int):
+        self.compress = compress
+        self.decompress = decompress
+        self.default_level: int = default_level
+
+
+_CODEC_DICT: dict[str, _Codec] = {
+    'none': _Codec(lambda data, level: data, lambda data: data, 0),
+    'zlib': _Codec(lambda data, level: zlib.compress(data, level), zlib.decompress, 6),
+    'bz2': _Codec(lambda data, level: bz2.compress(data, level), bz2.decompress, 9),
+    'lzma': _Codec(lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 6),
+}
+if zstandard is not None:
+    _CODEC_DICT['zstd'] = _Codec(lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+                                 lambda data: zstandard.ZstdDecompressor().decompress(data), 3)
+
+# Fastest codec with a good ratio on block id maps
+DEFAULT_CODEC: str = 'zstd' if 'zstd' in _CODEC_DICT else 'zlib'
+
+
+def available_codecs() -> list[str]:
+    """
+    :return: Names of the codecs usable here, 'zstd' needs the 'zstandard' package
+    """
+    return list(_CODEC_DICT)
+
+
+def is_world_archive(file_path) -> bool:
+    """
+    Check if the file is a world archive.
+
+    :param file_path: File path
+    :return: True if the file starts with the world archive magic
+    """
+    with open(file_path, 'rb') as file:
+        return file.read(len(WORLD_ARCHIVE_MAGIC)) == WORLD_ARCHIVE_MAGIC
+
+
+def _chunk_cells(chunk_index: tuple[int, int], chunk_size: int) -> tuple[slice, slice]:
+    return (slice(chunk_index[0] * chunk_size, (chunk_index[0] + 1) * chunk_size),
+            slice(chunk_index[1] * chunk_size, (chunk_index[1] + 1) * chunk_size))
+
+
+def _filled_chunks(layer: np.ndarray, chunk_size: int):
+    """
+    Yield the index of every chunk holding a block, one band of chunk rows at a time.
+
+    :param layer: Block id array
+    :param chunk_size: Cells per chunk side
+    """
+    column_starts = np.arange(0, layer.shape[1], chunk_size)
+    for cx, x in enumerate(range(0, layer.shape[0], chunk_size)):
+        filled_columns = layer[x:x + chunk_size].any(axis=0)
+        for cy in np.flatnonzero(np.logical_or.reduceat(filled_columns, column_starts)):
+            yield cx, int(cy)
+
+
+def write_archive(file_path, layers: list[np.ndarray], block_table: dict[int, str], codec: str = DEFAULT_CODEC,
+                  level: int | None = None, chunk_size: int = ARCHIVE_CHUNK_SIZE):
+    """
+    Write the layers into a world archive, every chunk compressed on its own.
+    The file is written next to the target and renamed over it, so a failed write never leaves a broken file.
+
+    :param file_path: Destination file path
+    :param layers: Layer block id arrays, all of the same shape
+    :param block_table: Block id -> block name
+    :param codec: Codec name, see 'available_codecs'
+    :param level: Compression level, the codec default if None
+    :param chunk_size: Cells per chunk side
+    """
+    if codec not in _CODEC_DICT:
+        raise ValueError(f'Codec \'{codec}\' is not available, use one of {available_codecs()}.')
+    selected_codec = _CODEC_DICT[codec]
+    level = selected_codec.default_level if level is None else level
+
+    size = layers[0].shape
+    dtype = block_id_dtype(max(block_table, default=0))
+    dtype_code = next(code for code, value in _DTYPE_CODE.items() if value == dtype)
+
+    table = _pack_block_table(block_table)
+    chunk_table = np.zeros((len(layers), -(-size[0] // chunk_size), -(-size[1] // chunk_size)), dtype=_CHUNK_ENTRY)
+    offset = _HEADER.size + len(table)
+
+    def compress(cells: np.ndarray) -> bytes:
+        return selected_codec.compress(np.ascontiguousarray(cells, dtype=dtype).tobytes(), level)
+
+    temporary_path = f'{file_path}.tmp'
+    with open(temporary_path, 'wb') as file, ThreadPoolExecutor(ARCHIVE_THREADS) as executor:
+        file.seek(offset)
+        for layer_index, layer in enumerate(layers):
+            if layer.shape != size:
+                raise IndexError(f'Layer size \'{layer.shape}\' does not match world size {size}!')
+            chunk_list = list(_filled_chunks(layer, chunk_size))
+            for chunk_index, data in zip(chunk_list, executor.map(
+                    compress, (layer[_chunk_cells(chunk_index, chunk_size)] for chunk_index in chunk_list))):
+                chunk_table[(layer_index, *chunk_index)] = (offset, len(data))
+                file.write(data)
+                offset += len(data)
+
+        packed_table = zlib.compress(chunk_table.tobytes())
+        file.write(packed_table)
+        file.seek(0)
+        file.write(_HEADER.pack(WORLD_ARCHIVE_MAGIC, WORLD_ARCHIVE_VERSION, size[0], size[1], len(layers), dtype_code,
+                                len(block_table), _CODEC_CODE[codec], chunk_size, offset, len(packed_table)))
+        file.write(table)
+    os.replace(temporary_path, file_path)
+
+
+class WorldArchive:
+    def __init__(self, file_path):
+        """
+        Open a world archive. Only the header and the chunk table are read,
+        chunks are decompressed when a region or the whole world is read.
+
+        :param file_path: File path
+        """
+        self.file_path = file_path
+        with open(file_path, 'rb') as file:
+            magic, version, width, height, layer_count, dtype_code, block_count, codec_code, chunk_size, \
+                table_offset, table_size = _HEADER.unpack(file.read(_HEADER.size))
+            if magic != WORLD_ARCHIVE_MAGIC:
+                raise ValueError(f'\'{file_path}\' is not a world archive.')
+            if version > WORLD_ARCHIVE_VERSION:
+                raise ValueError(f'World archive version \'{version}\' is newer than supported version '
+                                 f'{WORLD_ARCHIVE_VERSION}.')
+
+            self.block_table: dict[int, str] = _read_block_table(file, block_count)
+            self.size: tuple[int, int] = (width, height)
+            self.chunk_size: int = chunk_size
+            self.chunk_count: tuple[int, int] = (-(-width // chunk_size), -(-height // chunk_size))
+            file.seek(table_offset)
+            chunk_table = np.frombuffer(zlib.decompress(file.read(table_size)), dtype=_CHUNK_ENTRY)
+            self.chunk_table: np.ndarray = chunk_table.reshape(layer_count, *self.chunk_count)
+
+        self.version: int = version
+        self.layer_count: int = layer_count
+        self.dtype: np.dtype = _DTYPE_CODE[dtype_code]
+        self.codec: str = next((name for name, code in _CODEC_CODE.items() if code == codec_code), str(codec_code))
+
+    def __decompress(self, data: bytes) -> bytes:
+        if self.codec not in _CODEC_DICT:
+            raise ValueError(f'Codec \'{self.codec}\' of \'{self.file_path}\' is not available.')
+        return _CODEC_DICT[self.codec].decompress(data)
+
+    def read_region(self, x: int, y: int, w: int, h: int) -> list[np.ndarray]:
+        """
+        Read a region of every layer. Only the chunks overlapping the region are decompressed.
+
+        :param x: Region left cell
+        :param y: Region top cell
+        :param w: Region width in cells
+        :param h: Region height in cells
+        :return: Block id array of the region for each layer
+        """
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.size[0], x + w), min(self.size[1], y + h)
+        region_list = [np.zeros((max(0, w), max(0, h)), dtype=self.dtype) for _ in range(self.layer_count)]
+        if x0 >= x1 or y0 >= y1:
+            return region_list
+
+        cs = self.chunk_size
+        with open(self.file_path, 'rb') as file:
+            for layer_index, region in enumerate(region_list):
+                for cx in range(x0 // cs, -(-x1 // cs)):
+                    for cy in range(y0 // cs, -(-y1 // cs)):
+                        offset, data_size = self.chunk_table[layer_index, cx, cy]
+                        if not data_size:
+                            continue
+                        file.seek(int(offset))
+                        chunk_w, chunk_h = min(cs, self.size[0] - cx * cs), min(cs, self.size[1] - cy * cs)
+                        cells = np.frombuffer(self.__decompress(file.read(int(data_size))),
+                                              dtype=self.dtype).reshape(chunk_w, chunk_h)
+
+                        # Overlap of the chunk and the region in world cells
+                        left, top = max(x0, cx * cs), max(y0, cy * cs)
+                        right, bottom = min(x1, cx * cs + chunk_w), min(y1, cy * cs + chunk_h)
+                        region[left - x:right - x, top - y:bottom - y] = \
+                            cells[left - cx * cs:right - cx * cs, top - cy * cs:bottom - cy * cs]
+        return region_list
+
+    def read(self) -> WorldFile:
+        """
+        Read the whole world, chunks are decompressed in parallel.
+
+        :return: WorldFile with the layers in memory
+        """
+        with open(self.file_path, 'rb') as file:
+            data = file.read()
+
+        def decompress(entry: np.void) -> bytes:
+            offset, data_size = int(entry['offset']), int(entry['size'])
+            return self.__decompress(data[offset:offset + data_size])
+
+        layers = []
+        with ThreadPoolExecutor(ARCHIVE_THREADS) as executor:
+            for layer_index in range(self.layer_count):
+                layer = np.zeros(self.size, dtype=self.dtype)
+                chunk_table = self.chunk_table[layer_index]
+                chunk_list = list(zip(*(axis.tolist() for axis in np.nonzero(chunk_table['size']))))
+                for chunk_index, raw in zip(chunk_list, executor.map(decompress, (chunk_table[i] for i in chunk_list))):
+                    block = layer[_chunk_cells(chunk_index, self.chunk_size)]
+                    block[...] = np.frombuffer(raw, dtype=self.dtype).reshape(block.shape)
+                layers.append(layer)
+        return WorldFile(self.size, layers, self.block_table, self.version)
+
+
+def read_any(file_path, block_table: dict[int, str]) -> WorldFile:
+    """
+    Read a world in any saved format, every layer into memory.
+
+    :param file_path: CSV save, world file or world archive
+    :param block_table: Block id -> block name of the ids in a CSV save
+    :return: WorldFile, a CSV save has only the terrain layer
+    """
+    if is_world_archive(file_path):
+        return WorldArchive(file_path).read()
+    if is_world_file(file_path):
+        world_file = read_world(file_path)
+        world_file.layers = [np.array(layer) for layer in world_file.layers]
+        return world_file
+
+    data = read_csv(file_path, block_id_dtype(max(block_table, default=0)))
+    return WorldFile(data.shape, [data], block_table)
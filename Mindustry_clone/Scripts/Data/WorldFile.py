@@ -0,0 +1,420 @@
+import os
+import shutil
+import struct
+
+import numpy as np
+
+# File layout:
+#   header      magic, version, world size, layer count, dtype code, block count, data offset
+#   block table (id, name length, name) for each block type
+#   layer table (encoding, cell count) for each layer, since version 2
+#   padding up to 'DATA_ALIGNMENT'
+#   layer data, each one padded up to 'DATA_ALIGNMENT' since version 2
+#     raw     'width * height' cells in C order
+#     sparse  'cell count' flat indices of the non-empty cells, then their 'cell count' block ids
+# Version 1 files have no layer table, their layers are raw and not padded.
+# Journal layout:
+#   header      magic, version, world size, dtype code, block count
+#   block table (id, name length, name) for each block type
+#   records     layer index, cell count, then flat cell indices, old block ids and new block ids
+WORLD_FILE_MAGIC: bytes = b'MWLD'
+JOURNAL_MAGIC: bytes = b'MJRN'
+JOURNAL_VERSION: int = 1
+JOURNAL_EXTENSION: str = '.journal'  # Added to the world file path
+WORLD_FILE_VERSION: int = 2
+DATA_ALIGNMENT: int = 64
+WRITE_BLOCK_BYTES: int = 16 * 1024 * 1024  # Layers are written in blocks of rows, so a paged layer is never fully loaded
+SPARSE_LAYER_GAIN: int = 4  # A layer is saved sparse when that makes it at least this many times smaller
+
+LAYER_RAW: int = 0
+LAYER_SPARSE: int = 1
+
+_HEADER = struct.Struct('<4sHIIHBHI')
+_BLOCK_ENTRY = struct.Struct('<HB')
+_LAYER_ENTRY = struct.Struct('<BQ')
+_JOURNAL_HEADER = struct.Struct('<4sHIIBH')
+_JOURNAL_RECORD = struct.Struct('<HI')
+_DTYPE_CODE: dict[int, np.dtype] = {1: np.dtype(np.uint8), 2: np.dtype(np.uint16)}
+
+
+class WorldFile:
+    def __init__(self, size: tuple[int, int], layers: list[np.ndarray], block_table: dict[int, str],
+                 version: int = WORLD_FILE_VERSION):
+        self.size: tuple[int, int] = size
+        self.layers: list[np.ndarray] = layers
+        self.block_table: dict[int, str] = block_table
+        self.version: int = version
+
+
+def block_id_dtype(max_block_id: int) -> np.dtype:
+    """
+    Return the smallest unsigned dtype able to store every block id.
+
+    :param max_block_id: Largest block id
+    :return: uint8 or uint16
+    """
+    if max_block_id < 2 ** 8:
+        return np.dtype(np.uint8)
+    if max_block_id < 2 ** 16:
+        return np.dtype(np.uint16)
+    raise ValueError(f'Block id \'{max_block_id}\' does not fit in a world file.')
+
+
+def is_world_file(file_path) -> bool:
+    """
+    Check if the file is a binary world file.
+
+    :param file_path: File path
+    :return: True if the file starts with the world file magic
+    """
+    with open(file_path, 'rb') as file:
+        return file.read(len(WORLD_FILE_MAGIC)) == WORLD_FILE_MAGIC
+
+
+def read_csv(file_path, dtype: np.dtype) -> np.ndarray:
+    """
+    Read a CSV world file. The first row and the first column are the column and row numbers.
+
+    :param file_path: CSV file path
+    :param dtype: Block id dtype
+    :return: Block id array
+    """
+    # Old saves may hold the ids as floats
+    return np.loadtxt(file_path, delimiter=',', skiprows=1, ndmin=2)[:, 1:].astype(dtype)
+
+
+def write_csv(file_path, data: np.ndarray):
+    """
+    Write the block ids as a CSV world file, with the column and row numbers like 'pandas.DataFrame.to_csv'.
+
+    :param file_path: CSV file path
+    :param data: Block id array
+    """
+    header = ',' + ','.join(str(y) for y in range(data.shape[1]))
+    rows = np.column_stack((np.arange(data.shape[0]), data))
+    np.savetxt(file_path, rows, fmt='%d', delimiter=',', header=header, comments='')
+
+
+def cell_index_dtype(size: tuple[int, int]) -> np.dtype:
+    """
+    Return the dtype of flat cell indices, used by sparse layers and journals.
+
+    :param size: World size
+    :return: uint32 or uint64
+    """
+    return np.dtype(np.uint32) if size[0] * size[1] <= 2 ** 32 else np.dtype(np.uint64)
+
+
+def _row_blocks(size: tuple[int, int], dtype: np.dtype):
+    """
+    Yield row slices of about 'WRITE_BLOCK_BYTES' covering a layer.
+
+    :param size: World size
+    :param dtype: Block id dtype
+    """
+    rows = max(1, WRITE_BLOCK_BYTES // max(1, size[1] * dtype.itemsize))
+    for start in range(0, size[0], rows):
+        yield slice(start, start + rows)
+
+
+def _pack_header(size: tuple[int, int], block_table: dict[int, str], layer_table: list[tuple[int, int]]) \
+        -> tuple[bytes, int, np.dtype]:
+    """
+    Pack the header, the block table and the layer table, padded up to the layer data.
+
+    :param size: World size
+    :param block_table: Block id -> block name
+    :param layer_table: (encoding, cell count) of each layer
+    :return: Header bytes, data offset and block id dtype
+    """
+    dtype = block_id_dtype(max(block_table, default=0))
+    dtype_code = next(code for code, value in _DTYPE_CODE.items() if value == dtype)
+
+    table = _pack_block_table(block_table)
+    for encoding, cell_count in layer_table:
+        table += _LAYER_ENTRY.pack(encoding, cell_count)
+
+    data_offset = _HEADER.size + len(table)
+    data_offset += -data_offset % DATA_ALIGNMENT
+    header = _HEADER.pack(WORLD_FILE_MAGIC, WORLD_FILE_VERSION, size[0], size[1], len(layer_table),
+                          dtype_code, len(block_table), data_offset)
+    return header + table + b'\0' * (data_offset - len(header) - len(table)), data_offset, dtype
+
+
+def _layer_bytes(size: tuple[int, int], dtype: np.dtype, encoding: int, cell_count: int) -> int:
+    """
+    Return the size of a layer data in the file, without padding.
+    """
+    if encoding == LAYER_SPARSE:
+        return cell_count * (cell_index_dtype(size).itemsize + dtype.itemsize)
+    return size[0] * size[1] * dtype.itemsize
+
+
+def write_world(file_path, layers: list[np.ndarray], block_table: dict[int, str], sparse: bool = True):
+    """
+    Write the layers into a binary world file.
+    Mostly empty layers are saved as their non-empty cells only, see 'SPARSE_LAYER_GAIN'.
+    The file is written next to the target and renamed over it, so a failed save never leaves a broken file.
+
+    :param file_path: Destination file path
+    :param layers: Layer block id arrays, all of the same shape
+    :param block_table: Block id -> block name
+    :param sparse: Allow sparse layers
+    """
+    size = layers[0].shape
+    dtype = block_id_dtype(max(block_table, default=0))
+    layer_table = []
+    for layer in layers:
+        if layer.shape != size:
+            raise IndexError(f'Layer size \'{layer.shape}\' does not match world size {size}!')
+        cell_count = sum(int(np.count_nonzero(layer[rows])) for rows in _row_blocks(size, dtype)) if sparse else 0
+        if sparse and _layer_bytes(size, dtype, LAYER_SPARSE, cell_count) * SPARSE_LAYER_GAIN \
+                <= _layer_bytes(size, dtype, LAYER_RAW, 0):
+            layer_table.append((LAYER_SPARSE, cell_count))
+        else:
+            layer_table.append((LAYER_RAW, 0))
+    header, _, dtype = _pack_header(size, block_table, layer_table)
+    index_dtype = cell_index_dtype(size)
+
+    temporary_path = f'{file_path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(header)
+        for layer, (encoding, _) in zip(layers, layer_table):
+            if encoding == LAYER_SPARSE:
+                for rows in _row_blocks(size, dtype):
+                    indices = np.flatnonzero(layer[rows]) + rows.start * size[1]
+                    file.write(indices.astype(index_dtype))
+                for rows in _row_blocks(size, dtype):
+                    block = layer[rows]
+                    file.write(block[block != 0].astype(dtype))
+            else:
+                # Contiguous row blocks are written from the array memory without a copy
+                for rows in _row_blocks(size, dtype):
+                    file.write(np.ascontiguousarray(layer[rows], dtype=dtype))
+            file.write(b'\0' * (-file.tell() % DATA_ALIGNMENT))
+    os.replace(temporary_path, file_path)
+
+
+def create_world(file_path, size: tuple[int, int], layer_count: int, block_table: dict[int, str]) -> 'WorldFile':
+    """
+    Create an empty world file of raw layers and open it for writing.
+    The layer data is allocated without being written, empty cells take no disk space on most file systems.
+
+    :param file_path: File path
+    :param size: World size
+    :param layer_count: Number of layers
+    :param block_table: Block id -> block name
+    :return: WorldFile with layers memory-mapped in 'r+' mode
+    """
+    header, data_offset, dtype = _pack_header(size, block_table, [(LAYER_RAW, 0)] * layer_count)
+    layer_bytes = _layer_bytes(size, dtype, LAYER_RAW, 0)
+    with open(file_path, 'wb') as file:
+        file.write(header)
+        file.truncate(data_offset + layer_count * (layer_bytes + -layer_bytes % DATA_ALIGNMENT))
+    return read_world(file_path, 'r+')
+
+
+def read_world(file_path, mode: str = 'c') -> WorldFile:
+    """
+    Open a binary world file. Raw layers are memory-mapped, nothing is copied until a cell is written.
+    Sparse layers are expanded into memory, only the pages holding blocks are allocated.
+
+    :param file_path: File path
+    :param mode: np.memmap mode, 'c' keeps writes in memory, 'r+' writes them back to the file
+    :return: WorldFile
+    """
+    with open(file_path, 'rb') as file:
+        magic, version, width, height, layer_count, dtype_code, block_count, data_offset = \
+            _HEADER.unpack(file.read(_HEADER.size))
+        if magic != WORLD_FILE_MAGIC:
+            raise ValueError(f'\'{file_path}\' is not a world file.')
+        if version > WORLD_FILE_VERSION:
+            raise ValueError(f'World file version \'{version}\' is newer than supported version {WORLD_FILE_VERSION}.')
+
+        block_table = _read_block_table(file, block_count)
+        if version >= 2:
+            layer_table = [_LAYER_ENTRY.unpack(file.read(_LAYER_ENTRY.size)) for _ in range(layer_count)]
+        else:
+            layer_table = [(LAYER_RAW, 0)] * layer_count
+
+    size = (width, height)
+    dtype = _DTYPE_CODE[dtype_code]
+    index_dtype = cell_index_dtype(size)
+    layers = []
+    offset = data_offset
+    for encoding, cell_count in layer_table:
+        if encoding == LAYER_SPARSE:
+            indices = np.fromfile(file_path, dtype=index_dtype, count=cell_count, offset=offset)
+            values = np.fromfile(file_path, dtype=dtype, count=cell_count, offset=offset + indices.nbytes)
+            layer = np.zeros(size, dtype=dtype)
+            layer.reshape(-1)[indices] = values
+            layers.append(layer)
+        else:
+            layers.append(np.memmap(file_path, dtype=dtype, mode=mode, offset=offset, shape=size))
+
+        offset += _layer_bytes(size, dtype, encoding, cell_count)
+        if version >= 2:
+            offset += -offset % DATA_ALIGNMENT
+    return WorldFile(size, layers, block_table, version)
+
+
+def _pack_block_table(block_table: dict[int, str]) -> bytes:
+    table = b''
+    for block_id, name in sorted(block_table.items()):
+        encoded_name = name.encode('utf-8')
+        table += _BLOCK_ENTRY.pack(block_id, len(encoded_name)) + encoded_name
+    return table
+
+
+def _read_block_table(file, block_count: int) -> dict[int, str]:
+    """
+    Read a block table from the current file position.
+
+    :param file: File opened in binary mode
+    :param block_count: Number of block entries
+    :return: Block id -> block name
+    """
+    block_table: dict[int, str] = {}
+    for _ in range(block_count):
+        block_id, name_length = _BLOCK_ENTRY.unpack(file.read(_BLOCK_ENTRY.size))
+        block_table.update({block_id: file.read(name_length).decode('utf-8')})
+    return block_table
+
+
+def _pack_journal_header(size: tuple[int, int], block_table: dict[int, str]) -> bytes:
+    dtype = block_id_dtype(max(block_table, default=0))
+    dtype_code = next(code for code, value in _DTYPE_CODE.items() if value == dtype)
+    header = _JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, size[0], size[1], dtype_code, len(block_table))
+    return header + _pack_block_table(block_table)
+
+
+class WorldJournal:
+    def __init__(self, file_path, size: tuple[int, int], block_table: dict[int, str]):
+        """
+        Append-only record of cell edits, replayed over the world file it belongs to.
+        A new journal file is created with a header, an existing one is appended to.
+
+        :param file_path: Journal file path
+        :param size: World size
+        :param block_table: Block id -> block name of the recorded ids
+        """
+        self.file_path = file_path
+        self.size: tuple[int, int] = size
+        self.dtype: np.dtype = block_id_dtype(max(block_table, default=0))
+        self.index_dtype: np.dtype = cell_index_dtype(size)
+        self.__header: bytes = _pack_journal_header(size, block_table)
+        self.__pending: list[bytes] = []
+
+        if not os.path.isfile(file_path) or os.path.getsize(file_path) == 0:
+            with open(file_path, 'wb') as file:
+                file.write(self.__header)
+        self.__file = open(file_path, 'ab')
+
+    def append(self, layer_index: int, indices: np.ndarray, old_ids: np.ndarray, new_ids: np.ndarray):
+        """
+        Add a record, written to the file by the next 'flush'.
+
+        :param layer_index: Index of the edited layer
+        :param indices: Flat indices of the changed cells
+        :param old_ids: Block ids before the edit
+        :param new_ids: Block ids after the edit
+        """
+        if not len(indices):
+            return
+        self.__pending.append(_JOURNAL_RECORD.pack(layer_index, len(indices)))
+        self.__pending.append(np.asarray(indices, dtype=self.index_dtype).tobytes())
+        self.__pending.append(np.asarray(old_ids, dtype=self.dtype).tobytes())
+        self.__pending.append(np.broadcast_to(np.asarray(new_ids, dtype=self.dtype), (len(indices),)).tobytes())
+
+    def flush(self):
+        """
+        Write the pending records. They survive a crash of the editor from here on.
+        """
+        if not self.__pending:
+            return
+        self.__file.write(b''.join(self.__pending))
+        self.__file.flush()
+        self.__pending = []
+
+    def sync(self):
+        """
+        Write the pending records and wait until they are stored on the disk.
+        """
+        self.flush()
+        os.fsync(self.__file.fileno())
+
+    def get_size(self) -> int:
+        """
+        :return: Bytes of records, not counting the header
+        """
+        return self.__file.tell() - len(self.__header) + sum(len(data) for data in self.__pending)
+
+    def rotate(self, old_file_path):
+        """
+        Move the records into 'old_file_path' and start an empty journal.
+        The old records are kept until the world file holding them is written.
+        Records are appended if the old journal already exists.
+
+        :param old_file_path: File path of the old records
+        """
+        self.flush()
+        self.__file.close()
+        if os.path.isfile(old_file_path):
+            with open(self.file_path, 'rb') as source, open(old_file_path, 'ab') as destination:
+                source.seek(len(self.__header))
+                shutil.copyfileobj(source, destination)
+        else:
+            os.replace(self.file_path, old_file_path)
+
+        with open(self.file_path, 'wb') as file:
+            file.write(self.__header)
+        self.__file = open(self.file_path, 'ab')
+
+    def close(self):
+        self.flush()
+        self.__file.close()
+
+
+def read_journal(file_path) \
+        -> tuple[tuple[int, int], dict[int, str], list[tuple[int, np.ndarray, np.ndarray, np.ndarray]]]:
+    """
+    Read every complete record of a journal. A record cut by a crash is ignored.
+
+    :param file_path: Journal file path
+    :return: World size, block table and (layer index, flat cell indices, old block ids, new block ids) of each record
+    """
+    with open(file_path, 'rb') as file:
+        data = file.read()
+
+    magic, version, width, height, dtype_code, block_count = _JOURNAL_HEADER.unpack_from(data)
+    if magic != JOURNAL_MAGIC:
+        raise ValueError(f'\'{file_path}\' is not a journal file.')
+    if version > JOURNAL_VERSION:
+        raise ValueError(f'Journal version \'{version}\' is newer than supported version {JOURNAL_VERSION}.')
+
+    offset = _JOURNAL_HEADER.size
+    block_table: dict[int, str] = {}
+    for _ in range(block_count):
+        block_id, name_length = _BLOCK_ENTRY.unpack_from(data, offset)
+        offset += _BLOCK_ENTRY.size
+        block_table.update({block_id: data[offset:offset + name_length].decode('utf-8')})
+        offset += name_length
+
+    size = (width, height)
+    dtype = _DTYPE_CODE[dtype_code]
+    index_dtype = cell_index_dtype(size)
+    records = []
+    while offset + _JOURNAL_RECORD.size <= len(data):
+        layer_index, cell_count = _JOURNAL_RECORD.unpack_from(data, offset)
+        record_end = offset + _JOURNAL_RECORD.size + cell_count * (index_dtype.itemsize + 2 * dtype.itemsize)
+        if record_end > len(data):
+            break
+        offset += _JOURNAL_RECORD.size
+        indices = np.frombuffer(data, dtype=index_dtype, count=cell_count, offset=offset)
+        offset += cell_count * index_dtype.itemsize
+        old_ids = np.frombuffer(data, dtype=dtype, count=cell_count, offset=offset)
+        new_ids = np.frombuffer(data, dtype=dtype, count=cell_count, offset=offset + cell_count * dtype.itemsize)
+        offset = record_end
+        records.append((layer_index, indices, old_ids, new_ids))
+    return size, block_table, records
+
@@ -22,20 +22,64 @@ def ScreenToWorldCoordinate(mouse_position: pygame.math.Vector2 | tuple[int, int
     world_y = mouse_position[1] / camera.scale + camera.offset.y
     return pygame.math.Vector2((int(world_x), int(world_y)))
 
+def GetTileSize() -> int:
+    """
+    Return the on-screen size of one block in pixels.
+    The camera scale is quantized to whole pixels, so each zoom level maps to one tile size.
+
+    :return: Tile size in pixels.
+    """
+    return max(1, round(PIXEL * camera.scale))
+
+def CellRectToScreenRect(cell_rect: pygame.Rect) -> pygame.Rect:
+    """
+    Convert a rect of world indices --> screen rect.
+
+    :param cell_rect: Rect in cell units
+    :return: Screen rect covering the cells.
+    """
+    tile_size = GetTileSize()
+    origin = WorldToScreenCoordinate((0, 0))
+    return pygame.Rect(origin.x + cell_rect.x * tile_size, origin.y + cell_rect.y * tile_size,
+                       cell_rect.w * tile_size, cell_rect.h * tile_size)
+
+def ScreenRectToCellRange(rect: pygame.Rect, cell_size: int, cell_count: tuple[int, int]) -> tuple[range, range]:
+    """
+    Return the world cells overlapping the screen rect.
+    Cells are squares of 'cell_size' pixels counted from the world origin, for example tiles or chunks.
+
+    :param rect: Screen rect
+    :param cell_size: Cell size in pixels
+    :param cell_count: Number of cells of the world on each axis
+    :return: Ranges of the cell indices on each axis
+    """
+    origin = WorldToScreenCoordinate((0, 0))
+    x_start = max(0, int(rect.left - origin.x) // cell_size)
+    y_start = max(0, int(rect.top - origin.y) // cell_size)
+    x_end = min(cell_count[0], int(rect.right - 1 - origin.x) // cell_size + 1)
+    y_end = min(cell_count[1], int(rect.bottom - 1 - origin.y) // cell_size + 1)
+    return range(x_start, x_end), range(y_start, y_end)
+
 class Camera:
     def __init__(self):
-        self.screen: pygame.Surface = pygame.display.set_mode(SCREEN_SIZE)
+        # The window is opened by 'open_display'
+        self.screen: pygame.Surface | None = None
         self.offset: pygame.math.Vector2 = pygame.math.Vector2()
         self.scale: float = 1.0
         self.start_panning: pygame.math.Vector2 = pygame.math.Vector2()
         self.mouse_scroll_y: int = 0
 
+        # Full redraw for camera pan and zoom, otherwise only the dirty rects are redrawn
         self.screen_update: bool = True
+        self.pan_update: bool = True
+        self.dirty_rect_list: list[pygame.Rect] = []
+        # Screen position of the world origin in the last drawn frame
+        self.frame_origin: pygame.math.Vector2 = pygame.math.Vector2()
 
         l: int = CAMERA_PANNING_BORDER['left']
         t: int = CAMERA_PANNING_BORDER['top']
-        w: int = self.screen.get_size()[0] - CAMERA_PANNING_BORDER['left'] - CAMERA_PANNING_BORDER['right']
-        h: int = self.screen.get_size()[1] - CAMERA_PANNING_BORDER['top'] - CAMERA_PANNING_BORDER['bottom']
+        w: int = SCREEN_SIZE[0] - CAMERA_PANNING_BORDER['left'] - CAMERA_PANNING_BORDER['right']
+        h: int = SCREEN_SIZE[1] - CAMERA_PANNING_BORDER['top'] - CAMERA_PANNING_BORDER['bottom']
         self.__direction: pygame.math.Vector2 = pygame.math.Vector2()
         self.panning_border: pygame.Rect = pygame.Rect(l, t, w, h)
 
@@ -44,10 +88,31 @@ class Camera:
         # TO TEST OBJECT VISIBILITY ON SCREEN
         self.fake_screen: pygame.Rect = self.panning_border
 
-    def movement(self, mouse_position: pygame.math.Vector2):
+    def open_display(self, vsync: bool = False) -> pygame.Surface:
+        """
+        Open the window. Drawing needs the window, the rest of the camera works without it.
+
+        :param vsync: Wait for the display refresh on each update, if the driver supports it
+        :return: Screen surface
+        """
+        if vsync:
+            try:
+                # Vsync needs a renderer backed window
+                self.screen = pygame.display.set_mode(SCREEN_SIZE, pygame.SCALED, vsync=1)
+            except pygame.error:
+                self.screen = pygame.display.set_mode(SCREEN_SIZE)
+        else:
+            self.screen = pygame.display.set_mode(SCREEN_SIZE)
+        self.screen_update = True
+        return self.screen
+
+    def movement(self, mouse_position: pygame.math.Vector2, dt: float = 1 / UPDATE_RATE):
         """
         Camera screen panning and zoom. Self-update its offset and scale.
+        Key panning and zoom move by their speed per second times 'dt', so they do not depend on the frame rate.
+
         :param mouse_position: Mouse position
+        :param dt: Seconds since the last movement
         """
         keys = pygame.key.get_pressed()
 
@@ -55,6 +120,8 @@ class Camera:
         if pygame.key.get_mods() & pygame.KMOD_SHIFT:
             return
 
+        previous_offset = self.offset.copy()
+
         before_zoom = ScreenToWorldCoordinate(mouse_position)
         # Mouse scroll zoom
         if self.mouse_scroll_y < 0:
@@ -72,13 +139,13 @@ class Camera:
 
         # Key zoom
         if keys[pygame.K_q] or keys[pygame.K_LEFTBRACKET]:
-            self.scale += 0.1 * KEY_ZOOM_SPEED
+            self.scale += KEY_ZOOM_SPEED * dt
             self.screen_update = True
             if self.scale > ZOOM_MAX:
                 self.scale = ZOOM_MAX
                 self.screen_update = False
         elif keys[pygame.K_e] or keys[pygame.K_RIGHTBRACKET]:
-            self.scale -= 0.1 * KEY_ZOOM_SPEED
+            self.scale -= KEY_ZOOM_SPEED * dt
             self.screen_update = True
             if self.scale < ZOOM_MIN:
                 self.scale = ZOOM_MIN
@@ -93,7 +160,6 @@ class Camera:
         if mouses[2]:
             self.offset += (self.start_panning - mouse_position) // self.scale
             self.start_panning = mouse_position
-            self.screen_update = True
 
         # # Mouse border panning
         # if pygame.mouse.get_focused():
@@ -116,22 +182,35 @@ class Camera:
         # Key pressed panning
         if keys[pygame.K_LEFT] or keys[pygame.K_a]:
             self.__direction.x = -1
-            self.screen_update = True
         elif keys[pygame.K_RIGHT] or keys[pygame.K_d]:
             self.__direction.x = 1
-            self.screen_update = True
         else:
             self.__direction.x = 0
 
         if keys[pygame.K_UP] or keys[pygame.K_w]:
             self.__direction.y = -1
-            self.screen_update = True
         elif keys[pygame.K_DOWN] or keys[pygame.K_s]:
             self.__direction.y = 1
-            self.screen_update = True
         else:
             self.__direction.y = 0
-        self.offset += self.__direction * KEY_PANNING_SPEED // self.scale
+        self.offset += self.__direction * (KEY_PANNING_SPEED * dt / self.scale)
+
+        # Panning at the same scale only shifts the screen
+        if self.offset != previous_offset:
+            self.pan_update = True
+
+    def add_dirty_rect(self, rect: pygame.Rect):
+        """
+        Request a redraw of a part of the screen.
+        The rect is kept where it was on the last drawn frame, so a frame scrolled by the camera panning
+        moves it with the world, whatever camera position it was requested at.
+
+        :param rect: Screen rect to redraw
+        """
+        shift = WorldToScreenCoordinate((0, 0)) - self.frame_origin
+        rect = rect.move(-shift.x, -shift.y).clip(pygame.Rect((0, 0), SCREEN_SIZE))
+        if rect.w and rect.h:
+            self.dirty_rect_list.append(rect)
 
     def draw_panning_border(self):
         """
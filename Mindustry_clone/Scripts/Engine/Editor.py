@@ -1,35 +1,200 @@
+import functools
 import os.path
+import shutil
+import tempfile
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 
 from Scripts.Setting.BlockSetting import *
+from Scripts.Data.WorldFile import *
+from Scripts.Data.WorldArchive import *
+from Scripts.Data.EditHistory import *
 import numpy as np
-import pandas as pd
 
-class Layer:
-    def __init__(self, size: tuple[int, int]):
-        self.index_position: np.ndarray = np.zeros(size)
-        self.sprite_group: pygame.sprite.Group[Block] = pygame.sprite.Group()
-        self.sprite_dict: dict[tuple[int,int], Block] = {}
+# Undo and redo of every layer edit
+edit_history = EditHistory(HISTORY_MEMORY)
+
+def RemapBlockId(data: np.ndarray, block_table: dict[int, str]) -> np.ndarray:
+    """
+    Convert block ids saved in a file to the current block ids, matching them by block name.
+    Unknown blocks become empty cells. The data is returned as-is if all ids already match.
+
+    :param data: Saved block id array
+    :param block_table: Saved block id -> block name
+    :return: Block id array
+    """
+    block_id_dict = {block.name: block.id for block in block_dict.values()}
+    if all(block_id_dict.get(name) == block_id for block_id, name in block_table.items()):
+        return data
+
+    lookup_table = np.zeros(max(max(block_table, default=0), int(data.max(initial=0))) + 1,
+                            dtype=block_id_dtype(max(block_dict)))
+    for block_id, name in block_table.items():
+        lookup_table[block_id] = block_id_dict.get(name, 0)
+    return lookup_table[data]
+
+
+class Chunk:
+    def __init__(self, index: tuple[int, int], world_size: tuple[int, int]):
+        self.index: tuple[int, int] = index
 
-    def draw(self):
+        x, y = index[0] * CHUNK_SIZE, index[1] * CHUNK_SIZE
+        w, h = min(CHUNK_SIZE, world_size[0] - x), min(CHUNK_SIZE, world_size[1] - y)
+        self.cells: tuple[slice, slice] = (slice(x, x + w), slice(y, y + h))
+        self.size: tuple[int, int] = (w, h)
+
+        self.surface: pygame.Surface | None = None
+        self.memory: int = 0  # Baked surface size in bytes
+        self.tile_size: int = 0
+        self.dirty: bool = True
+
+    def bake(self, index_position: np.ndarray, tile_size: int):
         """
-        Draw sprites on the screen.
+        Render the chunk cells into its cached surface. A chunk without blocks has no surface.
+
+        :param index_position: Layer block ids
+        :param tile_size: Tile size in pixels
         """
-        self.sprite_group.update()
-        self.custom_draw()
+        surface_size = (self.size[0] * tile_size, self.size[1] * tile_size)
+        if self.surface is None or self.surface.get_size() != surface_size:
+            self.surface = pygame.Surface(surface_size, pygame.SRCALPHA)
+        else:
+            self.surface.fill((0, 0, 0, 0))
+
+        cells = index_position[self.cells]
+        if not cells.any():
+            # Nothing to draw, an empty chunk keeps no surface
+            self.surface = None
+            self.memory = 0
+            self.tile_size = tile_size
+            self.dirty = False
+            return
 
-    def custom_draw(self):
-        block: Block
-        for block in self.sprite_group:
-            if not block.visible:
+        blit_list = []
+        for x, y in zip(*np.nonzero(cells)):
+            block = block_dict.get(int(cells[x, y]))
+            if block is None:
                 continue
-            block.image = pygame.transform.scale(block.original_image, (PIXEL * camera.scale, PIXEL * camera.scale))
-            camera.screen.blit(block.image, block.rect)
+            texture, area = texture_cache.get(block, tile_size)
+            blit_list.append((texture, (int(x) * tile_size, int(y) * tile_size), area))
+        self.surface.blits(blit_list, doreturn=False)
+        profiler.count('tiles drawn', len(blit_list))
+
+        self.memory = surface_size[0] * surface_size[1] * 4
+        self.tile_size = tile_size
+        self.dirty = False
+
+
+class Layer:
+    def __init__(self, size: tuple[int, int], name: str = WORLD_LAYER_NAMES[0],
+                 history: EditHistory | None = edit_history):
+        """
+        :param size: World size
+        :param name: Layer name
+        :param history: Undo history the edits are recorded in, None to edit without undo
+        """
+        self.name: str = name
+        self.history: EditHistory | None = history
+        # Smallest dtype holding every block id, empty pages are not allocated until a cell is set
+        self.index_position: np.ndarray = np.zeros(size, dtype=block_id_dtype(max(block_dict)))
+
+        self.chunk_count: tuple[int, int] = (-(-size[0] // CHUNK_SIZE), -(-size[1] // CHUNK_SIZE))
+        # Chunks are created when first drawn, kept in least recently drawn order
+        self.chunk_dict: OrderedDict[tuple[int, int], Chunk] = OrderedDict()
+        self.__baked_memory: int = 0
+
+        # Number of edits, compared by the editor to know if the layer changed since it was saved
+        self.change_count: int = 0
+        # Called with (flat indices, old ids, new ids) of every edit, undo and redo included
+        self.on_change = None
+
+    def draw(self, surface: pygame.Surface):
+        """
+        Draw baked chunks on the surface.
+
+        :param surface: Surface in screen coordinates
+        """
+        self.custom_draw(surface)
+
+    def custom_draw(self, surface: pygame.Surface):
+        """
+        Blit the chunks overlapping both 'camera.fake_screen' and the surface clip area.
+        The visible chunk window is computed from the camera, off-screen chunks are never visited.
+
+        :param surface: Surface in screen coordinates
+        """
+        tile_size = GetTileSize()
+        chunk_pixel = CHUNK_SIZE * tile_size
+        origin = WorldToScreenCoordinate((0, 0))
+
+        x_visible, y_visible = ScreenRectToCellRange(camera.fake_screen, chunk_pixel, self.chunk_count)
+        x_clip, y_clip = ScreenRectToCellRange(surface.get_clip(), chunk_pixel, self.chunk_count)
+        for cx in range(max(x_visible.start, x_clip.start), min(x_visible.stop, x_clip.stop)):
+            for cy in range(max(y_visible.start, y_clip.start), min(y_visible.stop, y_clip.stop)):
+                chunk_surface = self.__get_chunk_surface((cx, cy), tile_size)
+                if chunk_surface is not None:
+                    surface.blit(chunk_surface, (origin.x + cx * chunk_pixel, origin.y + cy * chunk_pixel))
+
+    def render(self, surface: pygame.Surface, tile_size: int):
+        """
+        Draw the whole layer on the surface from its top left corner, without the camera or the chunk cache.
+
+        :param surface: Surface of at least the layer size times the tile size
+        :param tile_size: Tile size in pixels
+        """
+        for cx in range(self.chunk_count[0]):
+            for cy in range(self.chunk_count[1]):
+                chunk = Chunk((cx, cy), self.index_position.shape)
+                chunk.bake(self.index_position, tile_size)
+                if chunk.surface is not None:
+                    surface.blit(chunk.surface, (cx * CHUNK_SIZE * tile_size, cy * CHUNK_SIZE * tile_size))
+
+    def __get_chunk_surface(self, chunk_index: tuple[int, int], tile_size: int) -> (pygame.Surface | None):
+        """
+        Return the baked chunk surface, baking it if it is new, dirty or baked at another tile size.
+        Only the chunk cells are read, so a memory-mapped layer loads them from disk here.
+        The least recently drawn chunks are dropped when over 'CHUNK_CACHE_MEMORY'.
+
+        :param chunk_index: Chunk index
+        :param tile_size: Tile size in pixels
+        :return: Baked chunk surface, None if the chunk is empty
+        """
+        chunk = self.chunk_dict.get(chunk_index)
+        if chunk is None:
+            chunk = Chunk(chunk_index, self.index_position.shape)
+            self.chunk_dict[chunk_index] = chunk
+        elif not chunk.dirty and chunk.tile_size == tile_size:
+            self.chunk_dict.move_to_end(chunk_index)
+            profiler.count('chunk hits')
+            return chunk.surface
+
+        profiler.count('chunk bakes')
+        self.__baked_memory -= chunk.memory
+        chunk.bake(self.index_position, tile_size)
+        self.__baked_memory += chunk.memory
+        self.chunk_dict.move_to_end(chunk_index)
+
+        while self.__baked_memory > CHUNK_CACHE_MEMORY and len(self.chunk_dict) > 1:
+            _, oldest_chunk = self.chunk_dict.popitem(last=False)
+            self.__baked_memory -= oldest_chunk.memory
+        return chunk.surface
+
+    def mark_dirty(self, index: tuple[int, int]):
+        """
+        Mark the chunk holding the index to be baked again.
+
+        :param index: Changed index
+        """
+        chunk = self.chunk_dict.get((index[0] // CHUNK_SIZE, index[1] // CHUNK_SIZE))
+        if chunk is not None:
+            chunk.dirty = True
 
 
     def add(self, index: tuple[int, int], block: Block):
         """
-        Update layer data; block id in 'self.indices',
-        block sprite in 'self.sprite_group' and index in 'self.sprite_dict'.
+        Update the block id in 'self.index_position'.
+        Placed tiles only store their block id, the image is shared through 'block_dict'.
 
         :param index: Index where to draw the block data
         :param block: Block
@@ -45,17 +210,12 @@ class Layer:
         # Return if it already has the same block in the index
         if self.index_position[x][y] == block.id:
             return
-        else:
-            # Remove previous index data
-            self.remove(index)
-
-        new_block = block.copy()
-        new_block.position = pygame.math.Vector2((x, y)) * PIXEL
 
-        self.sprite_group.add(new_block)
-        self.sprite_dict.update({index: new_block})
-        self.index_position[index[0]][index[1]] = new_block.id
-        camera.screen_update = True
+        self.__record(np.array([x * self.index_position.shape[1] + y]),
+                      self.index_position[x:x + 1, y], block.id)
+        self.index_position[x][y] = block.id
+        self.mark_dirty(index)
+        self.__report_change(x, y, x, y)
 
     def remove(self, index):
         """
@@ -63,42 +223,219 @@ class Layer:
 
         :param index: Current index to remove
         """
-        if index in self.sprite_dict:
-            existence_block = self.sprite_dict.pop(index)
-            self.index_position[index[0]][index[1]] = 0
-            self.sprite_group.remove(existence_block)
-            camera.screen_update = True
+        x, y = index
+        if (x < 0 or x > self.index_position.shape[0] - 1) or (y < 0 or y > self.index_position.shape[1] - 1):
+            return
+
+        if self.index_position[x][y] != 0:
+            self.__record(np.array([x * self.index_position.shape[1] + y]),
+                          self.index_position[x:x + 1, y], 0)
+            self.index_position[x][y] = 0
+            self.mark_dirty(index)
+            self.__report_change(x, y, x, y)
+
+    def apply_mask(self, mask: np.ndarray, block: Block | None) -> (pygame.Rect | None):
+        """
+        Set every masked cell to the block in one step. 'None' removes the masked cells.
+
+        :param mask: Boolean array of the layer size
+        :param block: Block or None
+        :return: Changed region in cell units, None if nothing changed
+        """
+        block_id = 0 if block is None else block.id
+        changed = mask & (self.index_position != block_id)
+        changed_x = np.flatnonzero(changed.any(axis=1))
+        if not len(changed_x):
+            return None
+        changed_y = np.flatnonzero(changed.any(axis=0))
+
+        self.__record(np.flatnonzero(changed), self.index_position[changed], block_id)
+        self.index_position[changed] = block_id
+        self.mark_dirty_mask(changed)
+        return self.__report_change(changed_x[0], changed_y[0], changed_x[-1], changed_y[-1])
+
+    def apply_indices(self, indices: np.ndarray, block: Block | None) -> (pygame.Rect | None):
+        """
+        Set every index to the block in one step. 'None' removes the cells.
+        Indices out of the layer range are ignored.
+
+        :param indices: Array of (x, y) indices
+        :param block: Block or None
+        :return: Changed region in cell units, None if nothing changed
+        """
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1, 2)
+        x, y = indices[:, 0], indices[:, 1]
+        inside = (x >= 0) & (x < self.index_position.shape[0]) & (y >= 0) & (y < self.index_position.shape[1])
+        # Overlapping pen heads repeat indices, each cell is changed once
+        height = self.index_position.shape[1]
+        x, y = np.divmod(np.unique(x[inside] * height + y[inside]), height)
+
+        block_id = 0 if block is None else block.id
+        old_ids = self.index_position[x, y]
+        changed = old_ids != block_id
+        x, y = x[changed], y[changed]
+        if not len(x):
+            return None
+
+        self.__record(x * height + y, old_ids[changed], block_id)
+        self.index_position[x, y] = block_id
+        self.__mark_dirty_cells(x, y)
+        return self.__report_change(x.min(), y.min(), x.max(), y.max())
+
+    def __record(self, indices: np.ndarray, old_ids: np.ndarray, new_ids: np.ndarray | int):
+        """
+        Record an edit in 'self.history' and pass it to 'self.on_change'.
+
+        :param indices: Flat indices of the changed cells
+        :param old_ids: Block ids before the edit
+        :param new_ids: Block ids after the edit, or one id for every cell
+        """
+        if self.history is not None:
+            self.history.record(self, indices, old_ids, new_ids)
+        if self.on_change is not None:
+            self.on_change(indices, old_ids, new_ids)
+
+    def set_cells(self, indices: np.ndarray, ids: np.ndarray) -> (pygame.Rect | None):
+        """
+        Set cells to their own block id, used to undo and redo edits. Nothing is recorded in 'self.history'.
+
+        :param indices: Flat cell indices
+        :param ids: Block id of each cell
+        :return: Changed region in cell units, None if no cell is given
+        """
+        if not len(indices):
+            return None
+
+        if self.on_change is not None:
+            self.on_change(indices, self.index_position.reshape(-1)[indices], ids)
+        self.index_position.reshape(-1)[indices] = ids
+        x, y = np.divmod(indices, self.index_position.shape[1])
+        self.__mark_dirty_cells(x, y)
+        return self.__report_change(x.min(), y.min(), x.max(), y.max())
+
+    def __mark_dirty_cells(self, x: np.ndarray, y: np.ndarray):
+        """
+        Mark every chunk holding one of the cells to be baked again.
+
+        :param x: Cell x indices
+        :param y: Cell y indices
+        """
+        chunk_x, chunk_y = np.divmod(np.unique(x // CHUNK_SIZE * self.chunk_count[1] + y // CHUNK_SIZE), self.chunk_count[1])
+        for chunk_index in zip(chunk_x.tolist(), chunk_y.tolist()):
+            chunk = self.chunk_dict.get(chunk_index)
+            if chunk is not None:
+                chunk.dirty = True
+
+    def __report_change(self, x_min: int, y_min: int, x_max: int, y_max: int) -> pygame.Rect:
+        """
+        Count the edit and request a redraw of the screen area of a changed region.
+
+        :return: Changed region in cell units
+        """
+        self.change_count += 1
+        cell_rect = pygame.Rect(int(x_min), int(y_min), int(x_max - x_min) + 1, int(y_max - y_min) + 1)
+        camera.add_dirty_rect(CellRectToScreenRect(cell_rect))
+        return cell_rect
+
+    def mark_dirty_mask(self, mask: np.ndarray):
+        """
+        Mark every chunk holding a masked cell to be baked again.
+
+        :param mask: Boolean array of the layer size
+        """
+        w, h = mask.shape
+        padded = np.zeros((-(-w // CHUNK_SIZE) * CHUNK_SIZE, -(-h // CHUNK_SIZE) * CHUNK_SIZE), dtype=bool)
+        padded[:w, :h] = mask
+        chunk_mask = padded.reshape(padded.shape[0] // CHUNK_SIZE, CHUNK_SIZE, -1, CHUNK_SIZE).any(axis=(1, 3))
+        for cx, cy in zip(*np.nonzero(chunk_mask)):
+            chunk = self.chunk_dict.get((int(cx), int(cy)))
+            if chunk is not None:
+                chunk.dirty = True
 
     def load(self, file_path: FilePath):
-        data = np.genfromtxt(file_path, delimiter = ',', skip_header = 1)[:, 1:].astype(np.int8)
+        """
+        Import block ids from a CSV world file.
 
+        :param file_path: CSV file path
+        """
+        self.load_array(read_csv(file_path, block_id_dtype(max(block_dict))))
+
+    def load_array(self, data: np.ndarray):
+        """
+        Use the array as the layer block ids. The array is not copied, a memory-mapped array stays mapped.
+
+        :param data: Block id array of the layer size
+        """
         if not data.shape == self.index_position.shape:
             raise IndexError(f'World size \'{data.shape}\' does not match current layer {self.index_position.shape}!')
 
-        for x in range(data.shape[0]):
-            for y in range(data.shape[1]):
-                data_index_current = data[x][y]
-                if data_index_current == 0:
-                    continue
+        self.index_position = data
+        self.change_count += 1
+        for chunk in self.chunk_dict.values():
+            chunk.dirty = True
 
-                index = (x, y)
-                block = block_dict[data_index_current].copy()
-                block.position = pygame.math.Vector2(index) * PIXEL
-                self.index_position[x][y] = block.id
-                self.sprite_group.add(block)
-                self.sprite_dict.update({index: block})
+    def detach(self, file_path: FilePath):
+        """
+        Copy 'self.index_position' into memory if it is memory-mapped from the file, so the file can be overwritten.
+
+        :param file_path: File path about to be overwritten
+        """
+        if isinstance(self.index_position, np.memmap) and self.index_position.filename == os.path.abspath(file_path):
+            self.index_position = np.array(self.index_position)
+
+
+def _remove_file(file_path: FilePath):
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
 
 
 class WorldEditor:
     def __init__(self, world_size:tuple[int, int]):
         self.__world_size: tuple[int, int] = world_size
-        self.__base_world_index: np.ndarray = np.zeros(world_size).astype(np.int8)
         self.rect: pygame.Rect = pygame.Rect((0, 0), (world_size[0] * PIXEL, world_size[1] * PIXEL))
-        self.background_layer: Layer = Layer(world_size)
+        # Layers in drawing order, each one caches its own chunks
+        self.layers: list[Layer] = [Layer(world_size, name) for name in WORLD_LAYER_NAMES]
+        self.background_layer: Layer = self.layers[0]
+        self.layer_index: int = 0
+
+        # Worlds over 'PAGED_WORLD_CELLS' keep their layers in a memory-mapped working file.
+        # Cells are read from disk when their chunk is drawn or edited, and the system pages them out when memory runs low.
+        self.__working_file: WorldFile | None = None
+        if world_size[0] * world_size[1] > PAGED_WORLD_CELLS:
+            self.__working_file = self.__create_working_file()
+            for layer, data in zip(self.layers, self.__working_file.layers):
+                layer.load_array(data)
+
+        # Background save, the result is reported by 'update' on the main thread
+        self.__save_executor: ThreadPoolExecutor = ThreadPoolExecutor(1, thread_name_prefix='world_save')
+        self.__save_future: Future | None = None
+        self.__saved_change_count: int = self.__get_change_count()
+        # Edits made while the save thread copies the working file, see '__write_snapshot'
+        self.__copy_lock: threading.Lock = threading.Lock()
+        self.__copy_edit_list: list[tuple[int, np.ndarray, np.ndarray]] | None = None
+        self.__autosave_time: int = pygame.time.get_ticks()
+
+        # Edit journal of the world file, see 'open_journal'
+        self.__journal: WorldJournal | None = None
+        self.__journal_base: str = ''
+
+        # Last rendered world frame, kept to be scrolled while panning
+        self.frame: pygame.Surface = pygame.Surface(camera.screen.get_size()).convert()
+        self.__frame_tile_size: int = 0
+
+        # Grid lines of one chunk for the current tile size
+        self.__grid_pattern: pygame.Surface | None = None
+        self.__grid_color: pygame.Color = pygame.Color(WORLD_GRID_COLOR)
+        self.__grid_tile_size: int = 0
 
         self.grid_visible: bool = True
         self.rect_visible: bool = True
 
+        for i, layer in enumerate(self.layers):
+            layer.on_change = functools.partial(self.__on_layer_change, i)
+
     def GetCurrentWorldIndex(self, mouse_position: pygame.math.Vector2) -> (tuple[int, int] | tuple[None, None]):
         """
         Return to the world index where the mouse's position is at.
@@ -108,43 +445,210 @@ class WorldEditor:
         """
         x, y = ScreenToWorldCoordinate(mouse_position) // PIXEL
         # Return None the index is out of world base index range.
-        if (x < 0 or x > self.__base_world_index.shape[0] - 1) or (y < 0 or y > self.__base_world_index.shape[1] - 1):
+        if (x < 0 or x > self.__world_size[0] - 1) or (y < 0 or y > self.__world_size[1] - 1):
             return None, None
         return int(x), int(y)
 
+    def __create_working_file(self) -> WorldFile:
+        """
+        Create an empty world file in the temporary directory to page the layers from.
+        The file is removed when the editor is deleted.
+
+        :return: WorldFile opened for writing
+        """
+        handle, file_path = tempfile.mkstemp(prefix='world_', suffix='.mwld')
+        os.close(handle)
+        weakref.finalize(self, _remove_file, file_path)
+
+        block_table = {block.id: block.name for block in block_dict.values()}
+        return create_world(file_path, self.__world_size, len(self.layers), block_table)
+
+    def __on_layer_change(self, layer_index: int, indices: np.ndarray, old_ids: np.ndarray, new_ids):
+        """
+        Pass a layer edit to the journal, and to the save thread while it copies the working file.
+        Called before the cells are written.
+        """
+        if self.__journal is not None:
+            self.__journal.append(layer_index, indices, old_ids, new_ids)
+        if self.__copy_edit_list is not None:
+            with self.__copy_lock:
+                if self.__copy_edit_list is not None:
+                    self.__copy_edit_list.append((layer_index, np.array(indices), np.array(old_ids)))
+
+    def GetCurrentLayer(self) -> Layer:
+        """
+        Return the layer edited by the brush.
+
+        :return: Current layer
+        """
+        return self.layers[self.layer_index]
+
+    def GetBlockLayer(self, block: Block | None) -> Layer:
+        """
+        Return the layer a block is placed on, as declared by the block manifest.
+
+        :param block: Block, None for the current layer
+        :return: Layer named by the block
+        """
+        if block is None:
+            return self.GetCurrentLayer()
+        return self.layers[WORLD_LAYER_NAMES.index(block.layer)]
+
+    def __change_layer(self, step: int):
+        """
+        Select another layer to edit.
+
+        :param step: Layers to move, positive moves up
+        """
+        self.layer_index = (self.layer_index + step) % len(self.layers)
+        debug.event_update(f'Layer: {self.GetCurrentLayer().name}')
+
+    def __get_grid_pattern(self, tile_size: int) -> (pygame.Surface | None):
+        """
+        Return the grid lines of one chunk, baked once per tile size.
+        The lines fade out as the tiles get smaller, None if the grid is too small to be seen.
+
+        :param tile_size: Tile size in pixels
+        :return: Transparent grid surface
+        """
+        if tile_size != self.__grid_tile_size:
+            alpha = min(255, max(0, 255 * (tile_size - GRID_FADE_END) // (GRID_FADE_START - GRID_FADE_END)))
+            self.__grid_color = pygame.Color(WORLD_GRID_COLOR)
+            self.__grid_color.a = alpha
+            self.__grid_tile_size = tile_size
+            self.__grid_pattern = None
+
+            if alpha:
+                size = CHUNK_SIZE * tile_size
+                self.__grid_pattern = pygame.Surface((size, size), pygame.SRCALPHA)
+                for i in range(CHUNK_SIZE):
+                    self.__grid_pattern.fill(self.__grid_color, (i * tile_size, 0, 1, size))
+                    self.__grid_pattern.fill(self.__grid_color, (0, i * tile_size, size, 1))
+        return self.__grid_pattern
+
+    def __fill_grid_line(self, rect: pygame.Rect):
+        """
+        Fill a grid line rect with the grid color, blending it when the grid is fading.
+
+        :param rect: Line rect in screen coordinates
+        """
+        rect = rect.clip(self.frame.get_clip())
+        if not rect.w or not rect.h:
+            return
+
+        if self.__grid_color.a == 255:
+            self.frame.fill(self.__grid_color, rect)
+        else:
+            line = pygame.Surface(rect.size, pygame.SRCALPHA)
+            line.fill(self.__grid_color)
+            self.frame.blit(line, rect)
+
     def __draw_grid(self):
         """
-        Display world grid.
+        Display world grid. Only the chunks in the frame clip area are drawn.
         """
         if not self.grid_visible:
             return
 
-        x_line = list(np.linspace(0, self.__world_size[0], self.__world_size[0] + 1))
-        y_line = list(np.linspace(0, self.__world_size[1], self.__world_size[1] + 1))
-        for x in x_line:
-            pygame.draw.line(camera.screen, WORLD_GRID_COLOR, WorldToScreenCoordinate((x * PIXEL, y_line[0] * PIXEL)),
-                             WorldToScreenCoordinate((x * PIXEL, y_line[-1] * PIXEL)))
-        for y in y_line:
-            pygame.draw.line(camera.screen, WORLD_GRID_COLOR, WorldToScreenCoordinate((x_line[0] * PIXEL, y * PIXEL)),
-                             WorldToScreenCoordinate((x_line[-1] * PIXEL, y * PIXEL)))
+        tile_size = GetTileSize()
+        pattern = self.__get_grid_pattern(tile_size)
+        if pattern is None:
+            return
+
+        # Lines are placed from the world origin with the tile size, so they line up with the chunks.
+        chunk_pixel = CHUNK_SIZE * tile_size
+        origin = WorldToScreenCoordinate((0, 0))
+        chunk_count = (-(-self.__world_size[0] // CHUNK_SIZE), -(-self.__world_size[1] // CHUNK_SIZE))
+        x_range, y_range = ScreenRectToCellRange(self.frame.get_clip(), chunk_pixel, chunk_count)
+        for cx in x_range:
+            w = min(CHUNK_SIZE, self.__world_size[0] - cx * CHUNK_SIZE) * tile_size
+            for cy in y_range:
+                h = min(CHUNK_SIZE, self.__world_size[1] - cy * CHUNK_SIZE) * tile_size
+                self.frame.blit(pattern, (origin.x + cx * chunk_pixel, origin.y + cy * chunk_pixel), (0, 0, w, h))
+
+        # Closing lines on the right and bottom world border
+        right = origin.x + self.__world_size[0] * tile_size
+        bottom = origin.y + self.__world_size[1] * tile_size
+        self.__fill_grid_line(pygame.Rect(right, origin.y, 1, bottom - origin.y + 1))
+        self.__fill_grid_line(pygame.Rect(origin.x, bottom, right - origin.x + 1, 1))
 
     def __draw_rect(self):
         if not self.rect_visible:
             return
 
-        pygame.draw.rect(camera.screen, "YELLOW", self.rect, 4)
+        # Fill each border edge clipped by hand,
+        # pygame does not clip large outlined rects to the frame clip area.
+        x, y, w, h = self.rect
+        for edge in ((x, y, w, 4), (x, y + h - 4, w, 4), (x, y, 4, h), (x + w - 4, y, 4, h)):
+            self.frame.fill("YELLOW", pygame.Rect(edge).clip(self.frame.get_clip()))
 
-    def __draw_terrain_layer(self):
+    def __draw_layers(self):
         """
-        Draw terrain layers.
+        Draw every layer from the bottom to the top.
         """
-        self.background_layer.draw()
+        for layer in self.layers:
+            layer.draw(self.frame)
 
-    def draw(self):
-        camera.screen.fill((0, 0, 0))
-        self.__draw_terrain_layer()
+    def __render_frame(self, rect: pygame.Rect | None = None):
+        """
+        Render the world into the frame, limited to the rect.
+
+        :param rect: Frame area to render, the whole frame if None
+        """
+        self.frame.set_clip(rect)
+        self.frame.fill((0, 0, 0))
+        self.__draw_layers()
         self.__draw_grid()
         self.__draw_rect()
+        self.frame.set_clip(None)
+
+    def draw(self, rect: pygame.Rect | None = None):
+        """
+        Render the world frame.
+
+        :param rect: Frame area to render, the whole frame if None
+        """
+        self.__render_frame(rect)
+        if rect is None:
+            camera.frame_origin = WorldToScreenCoordinate((0, 0))
+            self.__frame_tile_size = GetTileSize()
+
+    def scroll(self, dirty_rect_list: list[pygame.Rect]) -> bool:
+        """
+        Shift the last frame by the camera panning and render only the newly exposed strips.
+
+        :param dirty_rect_list: Rects changed since the last frame, at their position in the last frame,
+                                rendered again at their shifted position
+        :return: False if the frame cannot be scrolled and must be drawn again
+        """
+        origin = WorldToScreenCoordinate((0, 0))
+        if GetTileSize() != self.__frame_tile_size:
+            return False
+
+        dx, dy = int(origin.x - camera.frame_origin.x), int(origin.y - camera.frame_origin.y)
+        w, h = self.frame.get_size()
+        if abs(dx) >= w or abs(dy) >= h:
+            return False
+
+        self.frame.scroll(dx, dy)
+        camera.frame_origin = origin
+
+        # Strips entering the screen, joined with the strips entering 'camera.fake_screen'
+        # where chunks may have been culled, so each axis is rendered in one pass.
+        exposed_rect_list = [rect.move(dx, dy) for rect in dirty_rect_list]
+        screen, fake_screen = self.frame.get_rect(), camera.fake_screen
+        if dx > 0:
+            exposed_rect_list.append(pygame.Rect(0, 0, fake_screen.left + dx, h))
+        elif dx < 0:
+            exposed_rect_list.append(pygame.Rect(fake_screen.right + dx, 0, screen.right - fake_screen.right - dx, h))
+        if dy > 0:
+            exposed_rect_list.append(pygame.Rect(0, 0, w, fake_screen.top + dy))
+        elif dy < 0:
+            exposed_rect_list.append(pygame.Rect(0, fake_screen.bottom + dy, w, screen.bottom - fake_screen.bottom - dy))
+
+        for rect in exposed_rect_list:
+            self.__render_frame(rect)
+        return True
 
     def toggle_tab(self, event: pygame.event.Event):
         if event.key == pygame.K_g:
@@ -153,37 +657,296 @@ class WorldEditor:
         elif event.key == pygame.K_m:
             self.rect_visible = not self.rect_visible
             camera.screen_update = True
+        elif event.key == pygame.K_PAGEUP:
+            self.__change_layer(1)
+        elif event.key == pygame.K_PAGEDOWN:
+            self.__change_layer(-1)
 
     def update(self):
         self.rect.topleft = WorldToScreenCoordinate((0, 0))
         self.rect.w = self.__world_size[0] * PIXEL * camera.scale
         self.rect.h = self.__world_size[1] * PIXEL * camera.scale
 
-    def save(self, file_name:str):
-        data: np.ndarray = self.background_layer.index_position.astype(np.int8)
-        DF = pd.DataFrame(data)
-        DF.to_csv(file_name)
+        if self.__journal is not None:
+            self.__journal.flush()
+        self.__poll_save()
+
+    def open_journal(self, file_name: FilePath):
+        """
+        Replay the edit journal of the world file, then record every following edit into it.
+        Call after loading the world file. Records are written each frame, so a crash loses at most
+        the edits of the last frame. Journals left by an unfinished save are replayed first.
 
-        print('Successfully saved.')
+        :param file_name: World file path
+        """
+        self.close_journal()
+        journal_path = file_name + JOURNAL_EXTENSION
+        old_journal_path = journal_path + '.old'
+
+        record_list = []
+        for path in (old_journal_path, journal_path):
+            if not os.path.isfile(path) or not os.path.getsize(path):
+                continue
+            size, block_table, records = read_journal(path)
+            if not size == self.__world_size:
+                raise IndexError(f'Journal world size \'{size}\' does not match current world {self.__world_size}!')
+            for layer_index, indices, old_ids, new_ids in records:
+                if layer_index < len(self.layers):
+                    record_list.append((layer_index, indices, RemapBlockId(old_ids, block_table),
+                                        RemapBlockId(new_ids, block_table)))
+
+        for layer_index, indices, _, new_ids in record_list:
+            self.layers[layer_index].set_cells(indices, new_ids)
+
+        block_table = {block.id: block.name for block in block_dict.values()}
+        if record_list:
+            # Merge the replayed records into one journal of the current block ids
+            temporary_path = journal_path + '.tmp'
+            _remove_file(temporary_path)
+            journal = WorldJournal(temporary_path, self.__world_size, block_table)
+            for record in record_list:
+                journal.append(*record)
+            journal.sync()
+            journal.close()
+            os.replace(temporary_path, journal_path)
+            _remove_file(old_journal_path)
+
+        self.__journal = WorldJournal(journal_path, self.__world_size, block_table)
+        self.__journal_base = os.path.abspath(file_name)
+        self.__saved_change_count = self.__get_change_count()
+
+    def close_journal(self):
+        """
+        Stop recording edits. The journal file is kept until the world is saved.
+        """
+        if self.__journal is None:
+            return
+        self.__journal.close()
+        self.__journal = None
+        self.__journal_base = ''
+
+    def __get_change_count(self) -> int:
+        return sum(layer.change_count for layer in self.layers)
+
+    def is_changed(self) -> bool:
+        """
+        :return: True if a layer changed since the last save
+        """
+        return self.__get_change_count() != self.__saved_change_count
+
+    def is_saving(self) -> bool:
+        return self.__save_future is not None and not self.__save_future.done()
+
+    def save(self, file_name: FilePath, status: str = 'Saved') -> bool:
+        """
+        Save every layer into one binary world file on a background thread.
+        The layers are copied first, so editing can go on while the file is written.
+        Paged layers are copied through their working file on the save thread instead of into memory.
+
+        :param file_name: File path
+        :param status: Log text shown when the save is done
+        :return: False if another save is still running
+        """
+        if self.is_saving():
+            debug.event_update('Save in progress')
+            return False
+        self.__poll_save()
+
+        for layer in self.layers:
+            layer.detach(file_name)
+        block_table = {block.id: block.name for block in block_dict.values()}
+
+        snapshot_path = None
+        if self.__working_file is not None:
+            handle, snapshot_path = tempfile.mkstemp(prefix='world_snapshot_', suffix='.mwld')
+            os.close(handle)
+            # Edits from here on are undone in the copy
+            self.__copy_edit_list = []
+            snapshot = None
+        else:
+            snapshot = [layer.index_position.copy() for layer in self.layers]
+
+        # The journal records are in the snapshot, they are dropped once the world file is written
+        old_journal_path = None
+        if self.__journal is not None and self.__journal_base == os.path.abspath(file_name):
+            old_journal_path = self.__journal.file_path + '.old'
+            self.__journal.rotate(old_journal_path)
+
+        self.__saved_change_count = self.__get_change_count()
+        working_path = None if self.__working_file is None else self.__working_file.layers[0].filename
+        self.__save_future = self.__save_executor.submit(self.__write_snapshot, file_name, snapshot, working_path,
+                                                         snapshot_path, old_journal_path, block_table, status)
+        debug.event_update('Saving...')
+        return True
+
+    def __write_snapshot(self, file_name: FilePath, snapshot: list[np.ndarray] | None, working_path: str | None,
+                         snapshot_path: str | None, old_journal_path: str | None, block_table: dict[int, str],
+                         status: str) -> str:
+        """
+        Write the copied layers, run on the save thread. A paged world is copied from its working file first,
+        and the edits made during the copy are undone in the copy, last edit first.
+
+        :return: Log text of the finished save
+        """
+        try:
+            if snapshot is None:
+                try:
+                    shutil.copyfile(working_path, snapshot_path)
+                finally:
+                    with self.__copy_lock:
+                        edit_list, self.__copy_edit_list = self.__copy_edit_list, None
+                snapshot = read_world(snapshot_path, 'r+').layers
+                for layer_index, indices, old_ids in reversed(edit_list):
+                    snapshot[layer_index].reshape(-1)[indices] = old_ids
+            write_world(file_name, snapshot, block_table)
+            if old_journal_path is not None:
+                _remove_file(old_journal_path)
+            return status
+        finally:
+            if snapshot_path is not None:
+                snapshot = None
+                _remove_file(snapshot_path)
+
+    def __poll_save(self):
+        """
+        Report a finished background save. A failed save is saved again by the next autosave.
+        """
+        if self.__save_future is None or not self.__save_future.done():
+            return
+        future, self.__save_future = self.__save_future, None
+        try:
+            result = future.result()
+        except OSError as error:
+            result = f'Save failed: {error.strerror or error}'
+            self.__saved_change_count = -1
+        except Exception as error:
+            result = f'Save failed: {type(error).__name__}: {error}'
+            self.__saved_change_count = -1
+        debug.event_update(result)
+        print(result)
+
+    def wait_save(self):
+        """
+        Block until the background save is written.
+        """
+        if self.__save_future is not None:
+            wait((self.__save_future,))
+        self.__poll_save()
+
+    def quick_save(self, file_name: FilePath, status: str = 'Saved') -> bool:
+        """
+        Make the edits durable by syncing the journal of the world file, which costs only the recorded edits.
+        The whole world file is written instead when it has no open journal,
+        or to compact the journal once it is over 'JOURNAL_COMPACT_BYTES'.
+
+        :param file_name: World file path
+        :param status: Log text shown when the save is done
+        :return: False if a background save is still running
+        """
+        if self.__journal is None or self.__journal_base != os.path.abspath(file_name) \
+                or self.__journal.get_size() > JOURNAL_COMPACT_BYTES:
+            return self.save(file_name, status)
+
+        self.__journal.sync()
+        self.__saved_change_count = self.__get_change_count()
+        debug.event_update(status)
+        return True
+
+    def autosave(self, file_name: FilePath):
+        """
+        Quick save the world every 'AUTOSAVE_INTERVAL' milliseconds, only if it changed since the last save.
+
+        :param file_name: World file path
+        """
+        if not AUTOSAVE_INTERVAL or pygame.time.get_ticks() - self.__autosave_time < AUTOSAVE_INTERVAL:
+            return
+        self.__autosave_time = pygame.time.get_ticks()
+        if self.is_changed() and not self.is_saving():
+            self.quick_save(file_name, 'Autosaved')
+
+    def export_csv(self, file_name: FilePath):
+        """
+        Export the terrain layer as a CSV file.
+
+        :param file_name: File path
+        """
+        write_csv(file_name, self.background_layer.index_position)
+
+        print('Successfully exported.')
 
     def load(self, file_path: FilePath):
+        """
+        Load a binary world file or a world archive, or import a CSV world file into the terrain layer.
+        Layers missing in the file are cleared.
+
+        :param file_path: File path
+        """
         if not os.path.isfile(file_path):
             raise FileNotFoundError(f"No such file directory in {file_path}.")
+        self.close_journal()
+
+        if not is_world_file(file_path) and not is_world_archive(file_path):
+            self.wait_save()
+            edit_history.clear()
+            self.background_layer.load(file_path)
+            if self.__working_file is not None:
+                self.__working_file.layers[0][:] = self.background_layer.index_position
+                self.background_layer.load_array(self.__working_file.layers[0])
+            self.__saved_change_count = self.__get_change_count()
+            return
 
-        # LOAD LAYERS CORRESPOND TO ITS LAYER_INDEX LATER
-        self.background_layer.load(file_path)
+        self.wait_save()
+        edit_history.clear()
+        world_file = WorldArchive(file_path).read() if is_world_archive(file_path) else read_world(file_path)
+        if not world_file.size == self.__world_size:
+            raise IndexError(f'World size \'{world_file.size}\' does not match current world {self.__world_size}!')
+
+        for i, layer in enumerate(self.layers):
+            if self.__working_file is not None:
+                # Copy the file into the working file in blocks of rows, the world is never fully in memory
+                working_data = self.__working_file.layers[i]
+                rows = max(1, WRITE_BLOCK_BYTES // (self.__world_size[1] * working_data.itemsize))
+                for start in range(0, self.__world_size[0], rows):
+                    if i < len(world_file.layers):
+                        data = world_file.layers[i][start:start + rows]
+                        working_data[start:start + rows] = RemapBlockId(data, world_file.block_table)
+                    else:
+                        working_data[start:start + rows] = 0
+                layer.load_array(working_data)
+            elif i < len(world_file.layers):
+                layer.load_array(RemapBlockId(world_file.layers[i], world_file.block_table))
+            else:
+                layer.load_array(np.zeros(self.__world_size, dtype=block_id_dtype(max(block_dict))))
+        self.__saved_change_count = self.__get_change_count()
 
 
 class DebuggingTool:
     def __init__(self):
         self.text: str = ""
+        self.rect: pygame.Rect = pygame.Rect(0, 0, 0, 0)
+        self.__font: pygame.font.Font | None = None
+
+    def __get_font(self) -> pygame.font.Font:
+        # Loaded when first used, not when the module is imported
+        if self.__font is None:
+            pygame.font.init()
+            self.__font = pygame.font.Font(FONT, FONT_SIZE)
+        return self.__font
 
     def event_update(self, event):
+        """
+        Change the log text. Only the old and new text area are redrawn.
+
+        :param event: Log text
+        """
+        camera.add_dirty_rect(self.rect)
         self.text = str(event)
+        self.rect = pygame.Rect((0, 0), self.__get_font().size(self.text))
+        self.rect.center = (SCREEN_SIZE[0] // 2, SCREEN_SIZE[1] // 1.5)
+        camera.add_dirty_rect(self.rect)
 
     def log(self):
-        text_surface = font.render(self.text, False, DEBUG_LOG_FONT_STYLE_COLOR)
-        text_rect = text_surface.get_rect(center=(SCREEN_SIZE[0] // 2,SCREEN_SIZE[1] // 1.5))
-        camera.screen.blit(text_surface, text_rect)
+        text_surface = self.__get_font().render(self.text, False, DEBUG_LOG_FONT_STYLE_COLOR)
+        camera.screen.blit(text_surface, self.rect)
 
 debug = DebuggingTool()
\ No newline at end of file
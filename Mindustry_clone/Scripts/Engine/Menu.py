@@ -7,17 +7,35 @@ class Button(pygame.sprite.Sprite):
                  value = None, image_source: FilePath = ""):
         super().__init__()
         self.image_source: str = image_source
-        if not len(self.image_source):
-            self.original_image: pygame.Surface = pygame.image.load('Images/NOT_FOUND.png').convert_alpha()
-        else:
-            self.original_image: pygame.Surface = pygame.image.load(self.image_source).convert_alpha()
+        self.__image: pygame.Surface | None = None
 
         self.size: tuple[int, int] = size
         self.position: pygame.math.Vector2 = pygame.math.Vector2(position)
-        self.image = pygame.transform.scale(self.original_image, self.size)
-        self.rect: pygame.Rect = self.image.get_rect(topleft=self.position)
+        self.rect: pygame.Rect = pygame.Rect(self.position, self.size)
         self.value = value
 
+    @property
+    def original_image(self) -> pygame.Surface:
+        return LoadImage(self.image_source)
+
+    @property
+    def image(self) -> pygame.Surface:
+        """
+        Button image scaled to the button size, decoded when first drawn.
+        """
+        if self.__image is None:
+            self.__image = pygame.transform.scale(self.original_image, self.size)
+        return self.__image
+
+    def set_image_source(self, image_source: FilePath):
+        """
+        Change the button image, the new image is decoded when drawn.
+
+        :param image_source: Image file path
+        """
+        self.image_source = image_source
+        self.__image = None
+
     def is_mouse_click(self) -> bool:
         """
         Check if mouse has clicked the button
@@ -32,7 +50,17 @@ class Button(pygame.sprite.Sprite):
         """
         self.rect.topleft = self.position + offset
 
+class BlockButton(Button):
+    @property
+    def original_image(self) -> pygame.Surface:
+        # The block image from the block atlas
+        if isinstance(self.value, Block):
+            return self.value.original_image
+        return LoadImage(self.image_source)
+
 class Menu:
+    button_class = Button
+
     def __init__(self, table: tuple[int, int], cell_size: int):
         self.button_group: pygame.sprite.Group[Button] = pygame.sprite.Group()
         self.button_index_dict: dict[int, Button] = {}
@@ -40,7 +68,7 @@ class Menu:
         i: int = 1
         for y in range(table[1]):
             for x in range(table[0]):
-                button = Button((cell_size, cell_size), (x * cell_size, y * cell_size))
+                button = self.button_class((cell_size, cell_size), (x * cell_size, y * cell_size))
                 self.button_group.add(button)
                 self.button_index_dict.update({i: button})
                 i += 1
@@ -135,9 +163,7 @@ class Menu:
                 continue
 
             button = self.button_index_dict[index+1]
-            button.image_source = image_source
-            button.original_image = pygame.image.load(image_source).convert_alpha()
-            button.image = pygame.transform.scale(button.original_image, button.size)
+            button.set_image_source(image_source)
 
     def _get_current_button(self) -> (Button | None):
         """
@@ -185,12 +211,12 @@ class BrushMenu(Menu):
         if brush_tool.brush_current == brush_select:
             brush_tool.brush_current = ""
             brush_tool.is_holding_copy_brush = False
-            camera.screen_update = True
+            camera.add_dirty_rect(self.rect)
 
             debug.event_update(f'Cancel \'{brush_select}\'')
         else:
             brush_tool.brush_current = brush_select
-            camera.screen_update = True
+            camera.add_dirty_rect(self.rect)
 
             debug.event_update(f'Brush: {brush_select}')
 
@@ -209,17 +235,20 @@ class BrushMenu(Menu):
 
 
 class BlockMenu(Menu):
+    button_class = BlockButton
+
     def __init__(self):
-        super().__init__((4, 1), 25)
+        # Four blocks per row, as many rows as needed
+        super().__init__((4, max(1, -(-len(block_dict) // 4))), 25)
         block_list = [block for block in block_dict.values()]
         self.offset = pygame.math.Vector2((700, 0))
         self._add_button_value(block_list)
-        self._add_button_image([block.image_source for block in block_list])
 
         self.block_rect_dict: dict[str, pygame.Rect] = {}
         for button in self.button_group:
-            block: Block = button.value
-            self.block_rect_dict.update({block.name: button.rect})
+            block: Block | None = button.value
+            if block is not None:
+                self.block_rect_dict.update({block.name: button.rect})
 
     def block_select(self):
         """
@@ -239,17 +268,17 @@ class BlockMenu(Menu):
         if isinstance(brush_tool.block_current, Block):
             if brush_tool.block_current.name == block_select.name:
                 brush_tool.block_current = None
-                camera.screen_update = True
+                camera.add_dirty_rect(self.rect)
                 debug.event_update(f'Canceled block \'{block_select.name}\'')
             else:
                 brush_tool.block_current = block_select
-                camera.screen_update = True
+                camera.add_dirty_rect(self.rect)
                 debug.event_update(f'Block selected : {block_select.name}')
             return
 
         # If 'block_current' is None, update the variable
         brush_tool.block_current = block_select
-        camera.screen_update = True
+        camera.add_dirty_rect(self.rect)
         debug.event_update(f'Block selected : {block_select.name}')
 
     def custom_draw(self):
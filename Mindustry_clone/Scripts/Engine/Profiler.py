@@ -0,0 +1,252 @@
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from Scripts.Engine.CameraScreen import *
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name: str = name
+        self.start: int = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exception):
+        self.profiler.add_time(self.name, self.start, time.perf_counter_ns())
+
+
+class Profiler:
+    def __init__(self, window: int = PROFILER_WINDOW):
+        """
+        Frame phase timer and counters. Phase times are summed per frame and kept for the last 'window' frames.
+        Trace events are recorded only while tracing.
+
+        :param window: Number of frames used for the percentiles
+        """
+        self.window: int = window
+        self.__phase_dict: dict[str, _Phase] = {}
+        self.__frame_time: dict[str, int] = {}  # Phase -> nanoseconds in the current frame
+        self.__samples: dict[str, deque[float]] = {}  # Phase -> milliseconds per frame
+        self.__frame_start: int = time.perf_counter_ns()
+
+        self.counters: dict[str, int] = {}  # Counts of the current frame
+        self.last_counters: dict[str, int] = {}  # Counts of the last finished frame
+        self.__interval_counters: dict[str, int] = {}  # Counts since the last overlay refresh
+
+        self.__trace_events: deque[tuple] | None = None
+        self.__time_origin: int = time.perf_counter_ns()
+
+        # Wall and CPU time spent waiting for input, the rest of the session is active
+        self.__cpu_origin: int = time.process_time_ns()
+        self.__idle_start: tuple[int, int] = (0, 0)
+        self.idle_time: int = 0
+        self.idle_cpu_time: int = 0
+
+        self.overlay_visible: bool = False
+        self.__overlay: pygame.Surface | None = None
+        self.__overlay_rect: pygame.Rect = pygame.Rect(0, 0, 0, 0)
+        self.__overlay_time: int = 0
+        self.__font: pygame.font.Font | None = None
+
+    def phase(self, name: str) -> _Phase:
+        """
+        Time a phase of the frame.
+
+            with profiler.phase('editor.draw'):
+                editor.draw()
+
+        :param name: Phase name
+        :return: Context manager
+        """
+        phase = self.__phase_dict.get(name)
+        if phase is None:
+            phase = self.__phase_dict[name] = _Phase(self, name)
+        return phase
+
+    def add_time(self, name: str, start: int, end: int):
+        """
+        :param name: Phase name
+        :param start: 'time.perf_counter_ns' at the phase start
+        :param end: 'time.perf_counter_ns' at the phase end
+        """
+        self.__frame_time[name] = self.__frame_time.get(name, 0) + end - start
+        if self.__trace_events is not None:
+            self.__trace_events.append(('X', name, start, end - start))
+
+    def count(self, name: str, amount: int = 1):
+        """
+        Add to a counter of the current frame.
+
+        :param name: Counter name
+        :param amount: Amount added
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def end_frame(self):
+        """
+        Close the current frame: store the phase times and the counters, and refresh the overlay.
+        """
+        now = time.perf_counter_ns()
+        self.__frame_time['frame'] = now - self.__frame_start
+        for name, duration in self.__frame_time.items():
+            samples = self.__samples.get(name)
+            if samples is None:
+                samples = self.__samples[name] = deque(maxlen=self.window)
+            samples.append(duration / 1e6)
+
+        if self.__trace_events is not None:
+            self.__trace_events.append(('X', 'frame', self.__frame_start, now - self.__frame_start))
+            if self.counters:
+                self.__trace_events.append(('C', 'counters', now, dict(self.counters)))
+
+        for name, amount in self.counters.items():
+            self.__interval_counters[name] = self.__interval_counters.get(name, 0) + amount
+        self.last_counters = self.counters
+        self.counters = {}
+        self.__frame_time = {}
+        self.__frame_start = now
+
+        if self.overlay_visible and now - self.__overlay_time >= PROFILER_OVERLAY_INTERVAL * 1_000_000:
+            self.__overlay_time = now
+            self.__render_overlay()
+
+    def begin_idle(self):
+        """
+        Mark the start of a wait for input.
+        """
+        self.__idle_start = (time.perf_counter_ns(), time.process_time_ns())
+
+    def end_idle(self):
+        """
+        Mark the end of a wait for input. The wait is not counted in the frame time.
+        """
+        start, cpu_start = self.__idle_start
+        now = time.perf_counter_ns()
+        self.idle_time += now - start
+        self.idle_cpu_time += time.process_time_ns() - cpu_start
+        self.__frame_start += now - start
+        if self.__trace_events is not None:
+            self.__trace_events.append(('X', 'idle', start, now - start))
+
+    def cpu_report(self) -> str:
+        """
+        :return: Idle and active wall time and CPU time of the session
+        """
+        wall_time = time.perf_counter_ns() - self.__time_origin
+        cpu_time = time.process_time_ns() - self.__cpu_origin
+        active_time, active_cpu_time = wall_time - self.idle_time, cpu_time - self.idle_cpu_time
+        return (f'idle {self.idle_time / 1e9:.1f} s (cpu {self.idle_cpu_time / 1e9:.2f} s), '
+                f'active {active_time / 1e9:.1f} s (cpu {active_cpu_time / 1e9:.2f} s, '
+                f'{100 * active_cpu_time / max(1, active_time):.0f}%)')
+
+    def percentiles(self, name: str) -> tuple[float, float, float]:
+        """
+        :param name: Phase name
+        :return: p50, p95 and p99 of the phase in milliseconds over the last frames
+        """
+        samples = self.__samples.get(name)
+        if not samples:
+            return 0.0, 0.0, 0.0
+        p50, p95, p99 = np.percentile(np.fromiter(samples, dtype=np.float64, count=len(samples)), (50, 95, 99))
+        return float(p50), float(p95), float(p99)
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.__overlay_time = time.perf_counter_ns()
+            self.__render_overlay()
+        else:
+            camera.add_dirty_rect(self.__overlay_rect)
+
+    def __get_font(self) -> pygame.font.Font:
+        if self.__font is None:
+            pygame.font.init()
+            self.__font = pygame.font.Font(FONT, PROFILER_FONT_SIZE)
+        return self.__font
+
+    def __render_overlay(self):
+        font = self.__get_font()
+        row_list = [('phase ms', 'p50', 'p95', 'p99')]
+        for name in sorted(self.__samples, key=lambda name: (name != 'frame', name)):
+            row_list.append((name, *(f'{value:.2f}' for value in self.percentiles(name))))
+        row_list.append((f'count / {PROFILER_OVERLAY_INTERVAL} ms', '', '', ''))
+        for name, amount in sorted(self.__interval_counters.items()):
+            row_list.append((name, '', '', str(amount)))
+        row_list.append((self.cpu_report(), '', '', ''))
+        if self.__trace_events is not None:
+            row_list.append((f'tracing {len(self.__trace_events)} events', '', '', ''))
+        self.__interval_counters = {}
+
+        # Name column left aligned, number columns right aligned
+        line_height = font.get_linesize()
+        column_widths = [max(font.size(row[i])[0] for row in row_list) + 12 for i in range(4)]
+        self.__overlay = pygame.Surface((sum(column_widths) + 8, line_height * len(row_list) + 8), pygame.SRCALPHA)
+        self.__overlay.fill((0, 0, 0, 160))
+        for i, row in enumerate(row_list):
+            x = 4
+            for j, cell in enumerate(row):
+                text_surface = font.render(cell, False, DEBUG_LOG_FONT_STYLE_COLOR)
+                offset = 0 if j == 0 else column_widths[j] - text_surface.get_width() - 4
+                self.__overlay.blit(text_surface, (x + offset, 4 + i * line_height))
+                x += column_widths[j]
+
+        # Bottom left corner, below the brush menu
+        camera.add_dirty_rect(self.__overlay_rect)
+        self.__overlay_rect = self.__overlay.get_rect(bottomleft=(0, SCREEN_SIZE[1]))
+        camera.add_dirty_rect(self.__overlay_rect)
+
+    def draw(self, surface: pygame.Surface):
+        """
+        Display the overlay of the phase percentiles and the counters.
+
+        :param surface: Screen surface
+        """
+        if self.overlay_visible and self.__overlay is not None:
+            surface.blit(self.__overlay, self.__overlay_rect)
+
+    def is_tracing(self) -> bool:
+        return self.__trace_events is not None
+
+    def start_trace(self, max_events: int = PROFILER_TRACE_EVENTS):
+        """
+        Record every phase and the counters of each frame. Only the last 'max_events' events are kept,
+        so a long session can be traced and dumped after a stall.
+
+        :param max_events: Maximum events kept
+        """
+        self.__trace_events = deque(maxlen=max_events)
+
+    def stop_trace(self):
+        self.__trace_events = None
+
+    def dump_trace(self, file_path: FilePath):
+        """
+        Write the recorded events in the Chrome trace event format, for 'chrome://tracing' or Perfetto.
+
+        :param file_path: JSON file path
+        """
+        event_list = []
+        for kind, name, start, value in self.__trace_events or ():
+            event = {'name': name, 'ph': kind, 'ts': (start - self.__time_origin) / 1000, 'pid': os.getpid(), 'tid': 0}
+            if kind == 'X':
+                event['dur'] = value / 1000
+            else:
+                event['args'] = value
+            event_list.append(event)
+
+        directory = os.path.dirname(os.fspath(file_path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(file_path, 'w') as file:
+            json.dump({'traceEvents': event_list, 'displayTimeUnit': 'ms'}, file)
+
+
+profiler = Profiler()
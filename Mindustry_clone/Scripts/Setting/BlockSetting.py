@@ -1,4 +1,30 @@
-from Scripts.Engine.CameraScreen import *
+import json
+from collections import OrderedDict
+
+from Scripts.Engine.Profiler import *
+from Scripts.Data.TextureAtlas import *
+
+# Decoded images shared by every block and button using the same file
+image_dict: dict[str, pygame.Surface] = {}
+
+def LoadImage(image_source: FilePath = "") -> pygame.Surface:
+    """
+    Return the decoded image of the file. Each file is read from disk only once.
+    The image is converted to the screen format if the window is open.
+
+    :param image_source: Image file path, 'NOT_FOUND.png' if empty
+    :return: Image surface
+    """
+    if not len(image_source):
+        image_source = 'Images/NOT_FOUND.png'
+
+    image = image_dict.get(image_source)
+    if image is None:
+        image = pygame.image.load(image_source)
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()
+        image_dict.update({image_source: image})
+    return image
 
 class Block(pygame.sprite.Sprite):
     def __init__(self, image_source: FilePath = ""):
@@ -6,61 +32,156 @@ class Block(pygame.sprite.Sprite):
         self.image_source: str = image_source
         self.name: str = ""
         self.id: int = 0
+        self.layer: str = WORLD_LAYER_NAMES[0]  # Layer the block is placed on
+        self.atlas_index: int | None = None  # Image index in the block atlas, None to load 'image_source' alone
 
-        if not len(self.image_source):
-            self.original_image: pygame.Surface = pygame.image.load('Images/NOT_FOUND.png').convert_alpha()
-        else:
-            self.original_image: pygame.Surface = pygame.image.load(self.image_source).convert_alpha()
+    @property
+    def original_image(self) -> pygame.Surface:
+        """
+        Block image, decoded when first used.
+        """
+        if self.atlas_index is None:
+            return LoadImage(self.image_source)
+        return texture_cache.get_image(self.atlas_index)
 
-        self.image: pygame.Surface = self.original_image
-        self.rect: pygame.Rect = self.image.get_rect()
-        self.position: pygame.math.Vector2 = pygame.math.Vector2()
+    @property
+    def image(self) -> pygame.Surface:
+        return self.original_image
 
-        self.visible: bool = True
+    @property
+    def rect(self) -> pygame.Rect:
+        return self.original_image.get_rect()
 
     def copy(self):
         """
         Return a new class Block that has the same variable data.
+        The image data is shared, not copied.
 
         :return: Self-copied block
         """
         cloned_block = Block(self.image_source)
         cloned_block.name = self.name
         cloned_block.id = self.id
-        cloned_block.image = self.image.copy()
-        cloned_block.rect = self.rect.copy()
-        cloned_block.position = self.position
+        cloned_block.layer = self.layer
+        cloned_block.atlas_index = self.atlas_index
         return cloned_block
 
-    def update(self):
+class TextureCache:
+    def __init__(self, max_size: int = TEXTURE_CACHE_SIZE):
+        self.__image_paths: list[str] = []
+        self.__atlas: TextureAtlas | None = None
+        self.__atlas_converted: bool = False
+        # Tile size -> block atlas scaled to the tile size, and the atlas indices scaled into it
+        self.__textures: OrderedDict[int, tuple[pygame.Surface, set[int]]] = OrderedDict()
+        self.max_size: int = max_size
+
+    def set_images(self, image_paths: list[FilePath]):
+        """
+        Use the images as the block atlas. They are packed when first drawn.
+
+        :param image_paths: Image file path of each atlas index
+        """
+        self.__image_paths = [str(image_path) for image_path in image_paths]
+        self.__atlas = None
+        self.__textures.clear()
+
+    def get_atlas(self) -> TextureAtlas:
+        """
+        Return the block atlas, read from the atlas cache or packed and cached on first use.
+        The atlas is converted to the screen format once the window is open.
+
+        :return: Block atlas
+        """
+        if self.__atlas is None:
+            self.__atlas = load_atlas(self.__image_paths, ATLAS_CACHE_DIR, 'block_atlas')
+            self.__atlas_converted = False
+        if not self.__atlas_converted and pygame.display.get_surface() is not None:
+            self.__atlas.surface = self.__atlas.surface.convert_alpha()
+            self.__atlas_converted = True
+        return self.__atlas
+
+    def get_image(self, atlas_index: int) -> pygame.Surface:
+        """
+        :param atlas_index: Atlas index
+        :return: Image sharing the atlas pixels
+        """
+        return self.get_atlas().subsurface(atlas_index)
+
+    def get(self, block: Block, size: int) -> tuple[pygame.Surface, pygame.Rect]:
         """
-        Self-display image corresponds to the camera.
+        Return the block atlas scaled to the tile size and the area of the block in it, to blit a sub-rect.
+        Each block is scaled once per tile size and shared by every tile of that type.
+        The least recently used tile size is dropped when the cache is full.
+
+        :param block: Block in the atlas
+        :param size: Tile size in pixels
+        :return: Scaled atlas and the block area
         """
-        self.visible = True
-        self.rect.topleft = WorldToScreenCoordinate(self.position)
-
-        # On-Off block visibility
-        if self.rect.x < camera.fake_screen.left - PIXEL * camera.scale or self.rect.x > camera.fake_screen.right:
-            self.visible = False
-        if self.rect.y < camera.fake_screen.top - PIXEL * camera.scale or self.rect.y > camera.fake_screen.bottom:
-            self.visible = False
-
-Grass = Block('Images/Block_Images/Grass_001.png')
-Grass.name = 'Grass'
-Grass.id = 1
-
-Rock = Block('Images/Block_Images/Rock_002.png')
-Rock.name = 'Rock'
-Rock.id = 2
-
-Sand = Block('Images/Block_Images/Sand_003.png')
-Sand.name = 'Sand'
-Sand.id = 3
-
-Water = Block('Images/Block_Images/Water_004.png')
-Water.name = 'Water'
-Water.id = 4
-
-block_dict: dict[int, Block] = {
-    1: Grass, 2: Rock, 3: Sand, 4: Water
-}
\ No newline at end of file
+        texture = self.__textures.get(size)
+        if texture is None:
+            profiler.count('texture atlas scales')
+            columns, rows = grid_size(len(self.__image_paths))
+            surface = pygame.Surface((columns * size, rows * size), pygame.SRCALPHA)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha()
+            texture = (surface, set())
+            self.__textures[size] = texture
+            if len(self.__textures) > self.max_size:
+                self.__textures.popitem(last=False)
+        else:
+            self.__textures.move_to_end(size)
+
+        surface, scaled_indices = texture
+        columns = surface.get_width() // size
+        area = pygame.Rect(block.atlas_index % columns * size, block.atlas_index // columns * size, size, size)
+        if block.atlas_index not in scaled_indices:
+            profiler.count('texture scales')
+            surface.fill((0, 0, 0, 0), area)
+            surface.blit(pygame.transform.scale(self.get_image(block.atlas_index), (size, size)), area)
+            scaled_indices.add(block.atlas_index)
+        else:
+            profiler.count('texture hits')
+        return surface, area
+
+texture_cache = TextureCache()
+
+def LoadBlockManifest(file_path: FilePath = BLOCK_MANIFEST) -> dict[int, Block]:
+    """
+    Read every block type from the manifest and use their images as the block atlas.
+    No image is decoded here, the atlas is packed when first drawn.
+
+    :param file_path: JSON manifest, a 'blocks' list of {'id', 'name', 'image', 'layer'}
+    :return: Block id -> block
+    """
+    with open(file_path) as file:
+        manifest = json.load(file)
+
+    loaded_dict: dict[int, Block] = {}
+    name_set: set[str] = set()
+    for atlas_index, entry in enumerate(manifest['blocks']):
+        block = Block(entry['image'])
+        block.name = str(entry['name'])
+        block.id = int(entry['id'])
+        block.layer = entry.get('layer', WORLD_LAYER_NAMES[0])
+        block.atlas_index = atlas_index
+
+        if not 0 < block.id < 2 ** 16:
+            raise ValueError(f'Block \'{block.name}\' id \'{block.id}\' is not between 1 and {2 ** 16 - 1}.')
+        if block.id in loaded_dict or block.name in name_set:
+            raise ValueError(f'Block \'{block.name}\' id \'{block.id}\' is defined twice in {file_path}.')
+        if block.layer not in WORLD_LAYER_NAMES:
+            raise ValueError(f'Block \'{block.name}\' layer \'{block.layer}\' is not one of {WORLD_LAYER_NAMES}.')
+        loaded_dict[block.id] = block
+        name_set.add(block.name)
+
+    texture_cache.set_images([block.image_source for block in loaded_dict.values()])
+    return loaded_dict
+
+def FindBlock(name: str) -> (Block | None):
+    """
+    :param name: Block name
+    :return: Block of the name, None if there is none
+    """
+    return next((block for block in block_dict.values() if block.name == name), None)
+
+block_dict: dict[int, Block] = LoadBlockManifest()
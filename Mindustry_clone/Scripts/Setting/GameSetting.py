@@ -3,17 +3,39 @@ from typing import Union
 from os import PathLike
 FilePath = Union[str, bytes, PathLike]
 
-pygame.init()
-clock: pygame.time.Clock = pygame.time.Clock()
+# Settings only, pygame is initialized by the application in 'main.py'
 
 # SCREEN SETTING
 SCREEN_SIZE: tuple[int, int] = (800, 600)
-FPS: int = 60
+FPS: int = 60  # Frame cap of the 'capped' render mode
+RENDER_MODE: str = 'capped'  # 'capped' at FPS, 'vsync' to the display refresh rate, or 'uncapped'
+UPDATE_RATE: int = 120  # Fixed input and camera updates per second, whatever the frame rate
+MAX_UPDATE_STEPS: int = 8  # Updates per frame before the loop drops time instead of catching up
+MAX_FRAME_SKIP: int = 4  # Frames skipped in a row while the updates are behind
+IDLE_WAIT_TIMEOUT: int = 500  # Milliseconds the loop sleeps for input while nothing changes, 0 never sleeps
+DIRTY_RECT_MAX: int = 8  # More dirty rects than this are merged into one redraw
 
 # WORLD SETTING
 PIXEL: int = 50
 WORLD_GRID_COLOR: str = "WHITE"
+GRID_FADE_START: int = 12  # Tile size in pixels where the grid starts fading out
+GRID_FADE_END: int = 4  # Tile size in pixels where the grid is hidden
 WORLD_BORDER_COLOR: str = "YELLOW"
+WORLD_LAYER_NAMES: list[str] = ['Terrain', 'Ore', 'Building', 'Overlay']  # Drawn from first to last
+
+# TEXTURE SETTING
+TEXTURE_CACHE_SIZE: int = 8  # Maximum tile sizes with a scaled block atlas kept in memory
+BLOCK_MANIFEST: str = 'Data/Blocks/block_manifest.json'  # Id, name, image and layer of every block type
+ATLAS_CACHE_DIR: str = 'Data/Cache'  # Packed block atlas, packed again when a block image changes
+
+# CHUNK SETTING
+CHUNK_SIZE: int = 16  # Cells per chunk side
+CHUNK_CACHE_MEMORY: int = 128 * 1024 * 1024  # Maximum bytes of baked chunk surfaces per layer
+PAGED_WORLD_CELLS: int = 2048 * 2048  # Larger worlds are paged from a working file on disk
+
+# SAVE SETTING
+AUTOSAVE_INTERVAL: int = 60 * 1000  # Milliseconds between autosaves of a changed world, 0 disables autosave
+JOURNAL_COMPACT_BYTES: int = 4 * 1024 * 1024  # Journal size where saving writes the whole world file again
 
 # CAMERA SETTING
 CAMERA_PANNING_BORDER: dict = {'left': 100, 'right': 100, 'top': 100, 'bottom': 100}
@@ -21,20 +43,30 @@ CAMERA_PANNING_BORDER_COLOR: str = "YELLOW"
 CAMERA_PANNING_BORDER_THICKNESS: int = 1
 
 MOUSE_PANNING_SPEED: float = 10.0
-KEY_PANNING_SPEED: float = 10.0
+KEY_PANNING_SPEED: float = 600.0  # World pixels per second at scale 1
 
-MOUSE_ZOOM_SPEED: float = 1.0
-KEY_ZOOM_SPEED: float = 1.0
+MOUSE_ZOOM_SPEED: float = 1.0  # Scale change per wheel step, times 0.1
+KEY_ZOOM_SPEED: float = 6.0  # Scale change per second
 
 ZOOM_MIN: float = 0.2
 ZOOM_MAX: float = 2.0
 
+# BRUSH SETTING
+PEN_HEAD_SIZE_MAX: int = 32
+HISTORY_MEMORY: int = 64 * 1024 * 1024  # Maximum bytes of undo history
+
+# PROFILER SETTING
+PROFILER_WINDOW: int = 300  # Frames used for the phase percentiles
+PROFILER_OVERLAY_INTERVAL: int = 500  # Milliseconds between overlay refreshes
+PROFILER_TRACE_EVENTS: int = 1_000_000  # Latest trace events kept while tracing
+PROFILER_TRACE_DIR: str = 'Data/Profile'  # Trace files dumped from the editor
+PROFILER_FONT_SIZE: int = 18
+
 # BUTTON SETTING
 BUTTON_SELECTED_COLOR: str = "GREEN"
 BUTTON_SELECTED_COLOR_THICKNESS: int = 4
 
 # FONT SETTING
 FONT = None
-DEBUG_LOG_FONT_STYLE_COLOR: str = "WHITE"
-
-font: pygame.font = pygame.font.Font(FONT, 30)
\ No newline at end of file
+FONT_SIZE: int = 30
+DEBUG_LOG_FONT_STYLE_COLOR: str = "WHITE"
\ No newline at end of file
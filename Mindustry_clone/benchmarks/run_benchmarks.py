@@ -0,0 +1,261 @@
+"""
+Headless benchmarks of the world editor hot paths.
+
+Run from anywhere, results are written as JSON:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --sizes 32 128 --repeat 3
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INVOCATION_DIR = os.getcwd()
+
+# Use the SDL dummy drivers, no window or audio device is needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+# Image paths are relative to the project directory
+os.chdir(PROJECT_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+from Scripts.BrushTool.BrushSetting import *
+from Scripts.BrushTool.BrushSetting import _bucket_fill
+
+WORLD_SIZES: list[int] = [32, 128, 512, 1024]
+ZOOM_LEVELS: list[float] = [0.2, 0.5, 1.0, 2.0]
+PEN_HEAD_KEYS: list[int] = [pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5, pygame.K_6, pygame.K_7]
+
+
+class BenchmarkSuite:
+    def __init__(self, sizes: list[int], repeat: int, seed: int, temporary_dir: str):
+        """
+        :param sizes: World sizes (square)
+        :param repeat: Runs per benchmark
+        :param seed: Random seed of the synthetic worlds
+        :param temporary_dir: Directory of the saved worlds, removed by the caller
+        """
+        self.sizes: list[int] = sizes
+        self.repeat: int = repeat
+        self.rng: np.random.Generator = np.random.default_rng(seed)
+        self.results: list[dict] = []
+        self.temporary_dir: str = temporary_dir
+
+    def measure(self, name: str, world_size: tuple[int, int], function, setup=None, **params):
+        """
+        Time the function 'self.repeat' times and record the result.
+
+        :param name: Benchmark name
+        :param world_size: World size
+        :param function: Function to time
+        :param setup: Function called before each run, not timed
+        :param params: Extra parameters recorded with the result
+        """
+        times = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+
+        result = {
+            'name': name,
+            'world_size': list(world_size),
+            'params': params,
+            'repeat': self.repeat,
+            'min_s': min(times),
+            'median_s': statistics.median(times),
+            'mean_s': statistics.fmean(times),
+        }
+        self.results.append(result)
+        print(f'{name:<28} {world_size[0]:>5}x{world_size[1]:<5} {str(params):<36} median {result["median_s"] * 1000:10.3f} ms',
+              file=sys.stderr)
+
+    def synthetic_world(self, world_size: tuple[int, int]) -> np.ndarray:
+        """
+        Return a world of patches of random blocks and empty cells.
+
+        :param world_size: World size
+        :return: Block id array
+        """
+        patch = 8
+        coarse = self.rng.integers(0, len(block_dict) + 1, (world_size[0] // patch + 1, world_size[1] // patch + 1))
+        data = np.kron(coarse, np.ones((patch, patch), dtype=np.int64))[:world_size[0], :world_size[1]]
+        return data.astype(np.uint8)
+
+    def reset_camera(self, scale: float = 1.0):
+        camera.scale = scale
+        camera.offset.update(0, 0)
+
+    def bench_load_save(self, world_size: tuple[int, int]):
+        editor = WorldEditor(world_size)
+        editor.background_layer.load_array(self.synthetic_world(world_size))
+
+        world_path = os.path.join(self.temporary_dir, f'world_{world_size[0]}')
+        csv_path = world_path + '.csv'
+        def save():
+            editor.save(world_path)
+            editor.wait_save()
+
+        self.measure('WorldEditor.save', world_size, save, format='binary')
+        self.measure('WorldEditor.export_csv', world_size, lambda: editor.export_csv(csv_path), format='csv')
+
+        self.measure('WorldEditor.load', world_size, lambda: WorldEditor(world_size).load(world_path), format='binary')
+        self.measure('Layer.load', world_size, lambda: Layer(world_size).load(csv_path), format='csv')
+
+    def bench_draw(self, world_size: tuple[int, int]):
+        editor = WorldEditor(world_size)
+        layer = editor.background_layer
+        layer.load_array(self.synthetic_world(world_size))
+
+        for scale in ZOOM_LEVELS:
+            self.reset_camera(scale)
+
+            def mark_all_dirty():
+                for chunk in layer.chunk_dict.values():
+                    chunk.dirty = True
+
+            self.measure('Layer.custom_draw', world_size, lambda: layer.custom_draw(editor.frame),
+                         setup=mark_all_dirty, scale=scale, cache='cold')
+            self.measure('Layer.custom_draw', world_size, lambda: layer.custom_draw(editor.frame),
+                         scale=scale, cache='warm')
+            self.measure('WorldEditor.draw', world_size, editor.draw, scale=scale)
+        self.reset_camera()
+
+    def bench_bucket_fill(self, world_size: tuple[int, int]):
+        worst_case_dict: dict[str, np.ndarray] = {}
+
+        # One region covering the whole world
+        worst_case_dict['empty'] = np.zeros(world_size, dtype=np.uint8)
+
+        # Every cell is its own region
+        checkerboard = np.indices(world_size).sum(axis=0) % 2
+        worst_case_dict['checkerboard'] = checkerboard.astype(np.uint8)
+
+        # One corridor snaking through the whole world
+        maze = np.zeros(world_size, dtype=np.uint8)
+        maze[1::2, :] = 1
+        maze[1::4, 0] = 0
+        maze[3::4, -1] = 0
+        worst_case_dict['snake'] = maze
+
+        for case, data in worst_case_dict.items():
+            self.measure('_bucket_fill', world_size, lambda: _bucket_fill(data, (0, 0)), case=case)
+
+            layer = Layer(world_size, history=None)
+            mask = _bucket_fill(data, (0, 0))
+            self.measure('Layer.apply_mask', world_size, lambda: layer.apply_mask(mask, block_dict[1]),
+                         setup=lambda: layer.load_array(data.copy()), case=case)
+
+    def bench_pen_stroke(self, world_size: tuple[int, int]):
+        layer = Layer(world_size, history=None)
+        brush = BrushTool()
+        brush.brush_current = 'pen'
+        brush.block_current = block_dict[1]
+
+        # Diagonal stroke sampled every few cells, like a fast mouse drag
+        step = max(1, world_size[0] // 32)
+        stroke = [(i, i) for i in range(0, min(world_size), step)]
+
+        def draw_stroke():
+            for index in stroke:
+                brush.index_selected = index
+                brush.use_brush(layer)
+            brush.end_stroke()
+
+        def clear_layer():
+            layer.load_array(np.zeros(world_size, dtype=np.uint8))
+
+        for pen_head_size, key in enumerate(PEN_HEAD_KEYS, start=1):
+            brush.change_pen_head_size(pygame.event.Event(pygame.KEYDOWN, key=key))
+            self.measure('BrushTool pen stroke', world_size, draw_stroke, setup=clear_layer,
+                         pen_head_size=pen_head_size, samples=len(stroke))
+
+    def bench_camera_pan(self, world_size: tuple[int, int]):
+        editor = WorldEditor(world_size)
+        editor.background_layer.load_array(self.synthetic_world(world_size))
+        mouse_position = pygame.math.Vector2(camera.screen.get_size()) // 2
+
+        self.reset_camera()
+        self.measure('Camera.movement', world_size, lambda: camera.movement(mouse_position))
+
+        pan_step = pygame.math.Vector2(7, 3)
+
+        def pan(scroll: bool):
+            for _ in range(30):
+                camera.offset += pan_step
+                editor.update()
+                if not scroll or not editor.scroll([]):
+                    editor.draw()
+                camera.screen.blit(editor.frame, (0, 0))
+
+        for scale in ZOOM_LEVELS:
+            self.reset_camera(scale)
+            editor.update()
+            editor.draw()
+            self.measure('Camera pan (scroll)', world_size, lambda: pan(True), scale=scale, frames=30)
+            self.measure('Camera pan (full redraw)', world_size, lambda: pan(False), scale=scale, frames=30)
+        self.reset_camera()
+
+    def run(self, benchmark_list: list[str]):
+        for size in self.sizes:
+            world_size = (size, size)
+            for benchmark in benchmark_list:
+                getattr(self, f'bench_{benchmark}')(world_size)
+
+    def report(self) -> dict:
+        return {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'pygame': pygame.version.ver,
+                'numpy': np.__version__,
+                'sizes': self.sizes,
+                'repeat': self.repeat,
+            },
+            'results': self.results,
+        }
+
+
+BENCHMARK_LIST: list[str] = ['load_save', 'draw', 'bucket_fill', 'pen_stroke', 'camera_pan']
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the world editor hot paths.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=WORLD_SIZES, help='World sizes (square)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic worlds')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARK_LIST, default=BENCHMARK_LIST, help='Benchmarks to run')
+    parser.add_argument('--output', help='JSON output file, printed to stdout if omitted')
+    args = parser.parse_args()
+
+    pygame.init()
+    camera.open_display()
+    # 'WorldEditor.save' prints a message per save
+    with tempfile.TemporaryDirectory(prefix='world_editor_bench_') as temporary_dir, \
+            open(os.devnull, 'w') as devnull:
+        suite = BenchmarkSuite(args.sizes, args.repeat, args.seed, temporary_dir)
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            suite.run(args.only)
+        finally:
+            sys.stdout = stdout
+
+    report = json.dumps(suite.report(), indent=2)
+    if args.output:
+        with open(os.path.join(INVOCATION_DIR, args.output), 'w') as file:
+            file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
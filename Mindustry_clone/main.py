@@ -1,30 +1,109 @@
+import argparse
+import os
+import time
+
+# Taken before the imports, so the startup profile includes them
+START_TIME: float = time.perf_counter()
+
 import pygame
 
 from Scripts.Engine.Menu import *
 
+IMPORT_TIME: float = time.perf_counter()
+
+class App:
+    def __init__(self, render_mode: str = RENDER_MODE):
+        """
+        Initialize pygame and open the window. Importing the game modules has no side effects,
+        everything that needs pygame or the window is started from here.
+
+        :param render_mode: 'capped' at FPS, 'vsync' to the display refresh rate, or 'uncapped'
+        """
+        pygame.init()
+        self.render_mode: str = render_mode
+        self.screen: pygame.Surface = camera.open_display(vsync=render_mode == 'vsync')
+        self.clock: pygame.time.Clock = pygame.time.Clock()
+
+    def tick(self):
+        """
+        End the frame, waiting to keep the frame rate under FPS in the 'capped' render mode.
+        """
+        self.clock.tick(FPS if self.render_mode == 'capped' else 0)
+
+    def quit(self):
+        print(f'CPU time: {profiler.cpu_report()}')
+        pygame.quit()
+        exit()
+
 class WorldEditorScreen:
-    def __init__(self):
+    def __init__(self, app: App):
+        self.app: App = app
         self.WORLD_SIZE: tuple[int, int] = (32, 32)
+        self.SAVE_PATH: str = 'Data/Save/world_editor_saved_1'
         self.editor = WorldEditor(self.WORLD_SIZE)
-        self.editor.load('Data/Save/world_editor_saved_1')
+        self.editor.load(self.SAVE_PATH)
+        self.editor.open_journal(self.SAVE_PATH)
+        # Trace file written when tracing stops, a new file in 'PROFILER_TRACE_DIR' if None
+        self.trace_path: str | None = None
 
-    def handle_draw(self):
-        if camera.screen_update:
-            self.editor.draw()
+    def __draw_screen(self):
+        camera.screen.blit(self.editor.frame, (0, 0))
+        with profiler.phase('menu.draw'):
             brush_menu.custom_draw()
             block_menu.custom_draw()
-            camera.draw_panning_border()
-            debug.log()
+        camera.draw_panning_border()
+        debug.log()
+        profiler.draw(camera.screen)
 
-            pygame.display.update()
+    def handle_draw(self):
+        if camera.screen_update or camera.pan_update:
+            # Camera panning scrolls the last frame, zoom redraws the whole world
+            with profiler.phase('editor.draw'):
+                if camera.screen_update or not self.editor.scroll(camera.dirty_rect_list):
+                    self.editor.draw()
+            self.__draw_screen()
+            with profiler.phase('display.update'):
+                pygame.display.update()
+        elif camera.dirty_rect_list:
+            # Redraw only the changed areas
+            dirty_rect_list = camera.dirty_rect_list
+            if len(dirty_rect_list) > DIRTY_RECT_MAX:
+                dirty_rect_list = [dirty_rect_list[0].unionall(dirty_rect_list[1:])]
+
+            for rect in dirty_rect_list:
+                with profiler.phase('editor.draw'):
+                    self.editor.draw(rect)
+                camera.screen.set_clip(rect)
+                self.__draw_screen()
+            camera.screen.set_clip(None)
+            with profiler.phase('display.update'):
+                pygame.display.update(dirty_rect_list)
 
         camera.screen_update = False
+        camera.pan_update = False
+        camera.dirty_rect_list = []
 
     def __quit_event(self, event: pygame.event.Event):
         # Exit the game.
         if event.type == pygame.QUIT:
-            pygame.quit()
-            exit()
+            # Let a running save finish writing
+            self.editor.wait_save()
+            self.editor.close_journal()
+            if profiler.is_tracing():
+                self.__toggle_trace()
+            self.app.quit()
+
+    def __toggle_trace(self):
+        # Start recording a trace, or stop and write it
+        if not profiler.is_tracing():
+            profiler.start_trace()
+            debug.event_update('Tracing')
+            return
+
+        trace_path = self.trace_path or os.path.join(PROFILER_TRACE_DIR, time.strftime('trace_%Y%m%d_%H%M%S.json'))
+        profiler.dump_trace(trace_path)
+        profiler.stop_trace()
+        debug.event_update(f'Trace saved: {trace_path}')
 
     def __camera_event(self, event: pygame.event.Event, mouse_position):
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -50,7 +129,24 @@ class WorldEditorScreen:
 
             # Save world map
             if event.key == pygame.K_s and pygame.key.get_mods() & pygame.KMOD_SHIFT:
-                self.editor.save("Data/Save/world_editor_saved_1")
+                self.editor.quick_save(self.SAVE_PATH)
+
+            # Export world map as CSV
+            if event.key == pygame.K_c and pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                self.editor.export_csv("Data/Save/world_editor_saved_1.csv")
+
+            # Profiler overlay and trace recording
+            if event.key == pygame.K_F3:
+                profiler.toggle_overlay()
+            if event.key == pygame.K_F4:
+                self.__toggle_trace()
+
+            # Undo and redo
+            if pygame.key.get_mods() & pygame.KMOD_CTRL:
+                if event.key == pygame.K_z and not pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                    debug.event_update('Undo' if edit_history.undo() else 'Nothing to undo')
+                elif event.key == pygame.K_y or event.key == pygame.K_z:
+                    debug.event_update('Redo' if edit_history.redo() else 'Nothing to redo')
 
         # Menu interacting
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -59,34 +155,183 @@ class WorldEditorScreen:
                 block_menu.block_select()
 
 
-    def handle_event(self, mouse_position):
-        for event in pygame.event.get():
+    def handle_event(self, mouse_position, event_list: list[pygame.event.Event] = ()):
+        """
+        :param mouse_position: Mouse position
+        :param event_list: Events already taken from the queue, handled before the queued ones
+        """
+        for event in [*event_list, *pygame.event.get()]:
             self.__quit_event(event)
             self.__camera_event(event, mouse_position)
             self.__ui_interacting_event(event)
 
+        self.editor.autosave(self.SAVE_PATH)
 
+    def is_idle(self) -> bool:
+        """
+        :return: True if no key or mouse button is held, nothing is moving or waiting to be drawn and no save
+                 is running, so the loop can sleep until the next event
+        """
+        if not IDLE_WAIT_TIMEOUT:
+            return False
+        if camera.screen_update or camera.pan_update or camera.dirty_rect_list or camera.mouse_scroll_y:
+            return False
+        if self.editor.is_saving():
+            return False
+        return not any(pygame.mouse.get_pressed()) and not any(pygame.key.get_pressed())
+
+    def wait_event(self) -> list[pygame.event.Event]:
+        """
+        Sleep until an event arrives or 'IDLE_WAIT_TIMEOUT' passes, the timeout keeps the autosave
+        and the profiler overlay running.
+
+        :return: The event that ended the wait, empty on timeout
+        """
+        profiler.begin_idle()
+        event = pygame.event.wait(IDLE_WAIT_TIMEOUT)
+        profiler.end_idle()
+        return [] if event.type == pygame.NOEVENT else [event]
+
+    def paint(self, mouse_position):
+        """
+        Use the brush once per frame, at the mouse position of the frame.
+        Pen strokes join the cells between two frames, so a slow frame does not leave gaps.
+
+        :param mouse_position: Mouse position
+        """
         if not mouse_on_menu_tabs(mouse_position):
             brush_tool.index_selected = self.editor.GetCurrentWorldIndex(mouse_position)
-            brush_tool.paint(self.editor.background_layer)
+            # Blocks are placed on their own layer, erase and copy work on the current layer
+            if brush_tool.brush_current in ('pen', 'fill'):
+                layer = self.editor.GetBlockLayer(brush_tool.block_current)
+            else:
+                layer = self.editor.GetCurrentLayer()
+            with profiler.phase('brush_tool.paint'):
+                brush_tool.paint(layer)
+        else:
+            # The menus are not painted on, a stroke leaving the world ends there
+            brush_tool.end_stroke()
 
-        camera.movement(mouse_position)
-        self.editor.update()
+    def update(self, mouse_position, dt: float):
+        """
+        One fixed update of the camera.
 
+        :param mouse_position: Mouse position
+        :param dt: Update timestep in seconds
+        """
+        with profiler.phase('camera.movement'):
+            camera.movement(mouse_position, dt)
 
-    def run(self):
+    def run(self, frame_count: int | None = None):
+        """
+        Run the frame loop. Input and the brush are handled every frame, the camera is updated
+        'UPDATE_RATE' times per second whatever the frame rate, and frames are skipped while the updates are behind.
+        While idle the loop sleeps until the next event instead of polling.
+
+        :param frame_count: Number of frames to run, forever if None
+        """
         # Start frame
         # Avoid moving camera-offset in the start frame
         mouse_position = pygame.math.Vector2((camera.screen.get_size()[0] // 2, camera.screen.get_size()[1] // 2))
+        step = 1 / UPDATE_RATE
+        # Time not yet simulated by the fixed updates, one step so the start frame updates once
+        accumulator = step
+        previous_time = time.perf_counter()
+        skipped_frames = 0
+        caption = ''
+        event_list = []
 
         # Update frame
-        while True:
-            self.handle_event(mouse_position)
-            self.handle_draw()
+        while frame_count is None or frame_count > 0:
+            if self.is_idle():
+                event_list = self.wait_event()
+                # Nothing moved while sleeping, one step so the waking input is updated at once
+                accumulator = step
+                previous_time = time.perf_counter()
+                mouse_position = pygame.math.Vector2(pygame.mouse.get_pos())
+
+            now = time.perf_counter()
+            accumulator += now - previous_time
+            previous_time = now
+
+            with profiler.phase('handle_event'):
+                self.handle_event(mouse_position, event_list)
+            event_list = []
+            # Painted at the camera position the frame was drawn at, before it moves
+            self.paint(mouse_position)
+
+            update_count = 0
+            while accumulator >= step and update_count < MAX_UPDATE_STEPS:
+                with profiler.phase('update'):
+                    self.update(mouse_position, step)
+                accumulator -= step
+                update_count += 1
+            profiler.count('updates', update_count)
 
-            clock.tick(FPS)
-            pygame.display.set_caption(f'{clock.get_fps():.2f}') # Display FPS
+            # After the camera moved, so the world border is drawn where the tiles are
+            with profiler.phase('editor.update'):
+                self.editor.update()
+
+            if accumulator >= step and skipped_frames < MAX_FRAME_SKIP:
+                # Behind, skip drawing so the next updates run sooner
+                skipped_frames += 1
+                profiler.count('frames skipped')
+            else:
+                # Time the updates could not catch up by now is dropped
+                accumulator = min(accumulator, step)
+                skipped_frames = 0
+                with profiler.phase('handle_draw'):
+                    self.handle_draw()
+
+            with profiler.phase('clock.tick'):
+                self.app.tick()
+            fps_text = f'{self.app.clock.get_fps():.2f}'
+            if fps_text != caption:
+                caption = fps_text
+                pygame.display.set_caption(caption) # Display FPS
+            profiler.end_frame()
             mouse_position = pygame.math.Vector2(pygame.mouse.get_pos()) # Updating mouse position
+            if frame_count is not None:
+                frame_count -= 1
+
+def profile_startup():
+    """
+    Start the editor, draw the first frame and print the time of each startup phase.
+    """
+    phase_list = [('import', IMPORT_TIME - START_TIME)]
+    start = time.perf_counter()
+    app = App()
+    phase_list.append(('init', time.perf_counter() - start))
+
+    start = time.perf_counter()
+    screen = WorldEditorScreen(app)
+    phase_list.append(('load world', time.perf_counter() - start))
+
+    start = time.perf_counter()
+    screen.run(frame_count=1)
+    phase_list.append(('first frame', time.perf_counter() - start))
+    phase_list.append(('total', time.perf_counter() - START_TIME))
+
+    for name, seconds in phase_list:
+        print(f'{name:<12} {seconds * 1000:10.2f} ms')
+    screen.editor.wait_save()
+    screen.editor.close_journal()
 
 if __name__ == '__main__':
-    WorldEditorScreen().run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='World editor.')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Print the time of each startup phase after the first frame and exit')
+    parser.add_argument('--render-mode', choices=['capped', 'vsync', 'uncapped'], default=RENDER_MODE,
+                        help='Frame rate limit: FPS, the display refresh rate or none')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='Record a Chrome trace from the start, written to PATH on exit or when F4 is pressed')
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup()
+    else:
+        world_editor_screen = WorldEditorScreen(App(args.render_mode))
+        if args.trace:
+            world_editor_screen.trace_path = args.trace
+            profiler.start_trace()
+        world_editor_screen.run()
\ No newline at end of file
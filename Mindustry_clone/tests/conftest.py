@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The editor runs without a window, image and manifest paths are relative to the project directory
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.chdir(PROJECT_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+
+@pytest.fixture(scope='session')
+def display():
+    """
+    Initialize pygame and open the dummy display the editor draws into.
+    """
+    from Scripts.Engine.CameraScreen import camera
+    import pygame
+
+    pygame.init()
+    camera.open_display()
+    yield camera.screen
+    pygame.quit()
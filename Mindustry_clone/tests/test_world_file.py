@@ -0,0 +1,101 @@
+import struct
+
+import numpy as np
+import pytest
+
+from Scripts.Data.WorldFile import *
+from Scripts.Data.WorldFile import _HEADER, _LAYER_ENTRY, _pack_block_table
+
+BLOCK_TABLE: dict[int, str] = {1: 'Grass', 2: 'Rock', 3: 'Sand', 4: 'Water'}
+
+
+def layer_encodings(file_path) -> list[int]:
+    with open(file_path, 'rb') as file:
+        header = _HEADER.unpack(file.read(_HEADER.size))
+        file.read(len(_pack_block_table(BLOCK_TABLE)))
+        return [_LAYER_ENTRY.unpack(file.read(_LAYER_ENTRY.size))[0] for _ in range(header[4])]
+
+
+def write_world_v1(file_path, layers: list[np.ndarray], block_table: dict[int, str]):
+    # Version 1 layout: no layer table, raw layers back to back
+    size = layers[0].shape
+    table = _pack_block_table(block_table)
+    data_offset = _HEADER.size + len(table)
+    data_offset += -data_offset % DATA_ALIGNMENT
+    header = _HEADER.pack(WORLD_FILE_MAGIC, 1, size[0], size[1], len(layers), 1, len(block_table), data_offset)
+    with open(file_path, 'wb') as file:
+        file.write(header + table + b'\0' * (data_offset - len(header) - len(table)))
+        for layer in layers:
+            file.write(np.ascontiguousarray(layer, dtype=np.uint8).tobytes())
+
+
+def test_round_trip_raw_and_sparse(tmp_path):
+    rng = np.random.default_rng(0)
+    full = rng.integers(0, 5, (37, 29)).astype(np.uint8)
+    sparse = np.zeros((37, 29), dtype=np.uint8)
+    sparse[3, 4], sparse[36, 28], sparse[10, 0] = 2, 4, 1
+    empty = np.zeros((37, 29), dtype=np.uint8)
+
+    file_path = tmp_path / 'world'
+    write_world(file_path, [full, sparse, empty], BLOCK_TABLE)
+    assert layer_encodings(file_path) == [LAYER_RAW, LAYER_SPARSE, LAYER_SPARSE]
+
+    world_file = read_world(file_path)
+    assert world_file.version == WORLD_FILE_VERSION
+    assert world_file.size == (37, 29)
+    assert world_file.block_table == BLOCK_TABLE
+    for expected, layer in zip([full, sparse, empty], world_file.layers):
+        np.testing.assert_array_equal(layer, expected)
+
+
+def test_sparse_disabled_writes_raw_layers(tmp_path):
+    layer = np.zeros((16, 16), dtype=np.uint8)
+    layer[1, 1] = 3
+    write_world(tmp_path / 'world', [layer], BLOCK_TABLE, sparse=False)
+
+    assert layer_encodings(tmp_path / 'world') == [LAYER_RAW]
+    np.testing.assert_array_equal(read_world(tmp_path / 'world').layers[0], layer)
+
+
+def test_wide_block_ids_use_uint16(tmp_path):
+    block_table = {1: 'Grass', 300: 'Thorium'}
+    layer = np.zeros((8, 8), dtype=np.uint16)
+    layer[2, 5], layer[7, 7] = 300, 1
+    write_world(tmp_path / 'world', [layer, layer.copy()], block_table)
+
+    world_file = read_world(tmp_path / 'world')
+    assert world_file.block_table == block_table
+    assert all(data.dtype == np.uint16 for data in world_file.layers)
+    np.testing.assert_array_equal(world_file.layers[1], layer)
+
+
+def test_read_version_1(tmp_path):
+    rng = np.random.default_rng(1)
+    layers = [rng.integers(0, 5, (13, 7)).astype(np.uint8) for _ in range(2)]
+    write_world_v1(tmp_path / 'world_v1', layers, BLOCK_TABLE)
+
+    world_file = read_world(tmp_path / 'world_v1')
+    assert world_file.version == 1
+    assert world_file.block_table == BLOCK_TABLE
+    for expected, layer in zip(layers, world_file.layers):
+        np.testing.assert_array_equal(layer, expected)
+
+
+def test_created_world_writes_back(tmp_path):
+    world_file = create_world(tmp_path / 'world', (20, 10), 2, BLOCK_TABLE)
+    world_file.layers[1][4, 5] = 2
+    world_file.layers[1].flush()
+
+    world_file = read_world(tmp_path / 'world')
+    assert world_file.layers[1][4, 5] == 2
+    assert np.count_nonzero(world_file.layers[0]) == 0
+
+
+def test_rejects_newer_version(tmp_path):
+    write_world(tmp_path / 'world', [np.zeros((4, 4), dtype=np.uint8)], BLOCK_TABLE)
+    with open(tmp_path / 'world', 'r+b') as file:
+        file.seek(len(WORLD_FILE_MAGIC))
+        file.write(struct.pack('<H', WORLD_FILE_VERSION + 1))
+
+    with pytest.raises(ValueError):
+        read_world(tmp_path / 'world')
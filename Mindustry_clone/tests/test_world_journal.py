@@ -0,0 +1,182 @@
+import os
+
+import numpy as np
+import pytest
+
+from Scripts.Data.WorldFile import *
+from Scripts.Data.WorldFile import _JOURNAL_RECORD
+
+SIZE: tuple[int, int] = (24, 40)
+BLOCK_TABLE: dict[int, str] = {1: 'Grass', 2: 'Rock', 3: 'Sand', 4: 'Water'}
+RECORD_LIST: list[tuple[int, list[int], list[int], list[int]]] = [
+    (0, [0, 5, 959], [0, 0, 0], [1, 1, 1]),
+    (2, [40, 41], [0, 3], [4, 4]),
+    (1, [100], [2], [0]),
+]
+
+
+def write_journal(file_path, record_list=RECORD_LIST) -> WorldJournal:
+    journal = WorldJournal(file_path, SIZE, BLOCK_TABLE)
+    for record in record_list:
+        journal.append(*record)
+    journal.flush()
+    return journal
+
+
+def assert_records(records, record_list=RECORD_LIST):
+    assert len(records) == len(record_list)
+    for (layer_index, indices, old_ids, new_ids), expected in zip(records, record_list):
+        assert layer_index == expected[0]
+        for array, expected_array in zip((indices, old_ids, new_ids), expected[1:]):
+            np.testing.assert_array_equal(array, expected_array)
+
+
+def test_round_trip(tmp_path):
+    write_journal(tmp_path / 'world.journal').close()
+
+    size, block_table, records = read_journal(tmp_path / 'world.journal')
+    assert size == SIZE
+    assert block_table == BLOCK_TABLE
+    assert_records(records)
+
+
+def test_one_new_id_for_every_cell(tmp_path):
+    journal = WorldJournal(tmp_path / 'world.journal', SIZE, BLOCK_TABLE)
+    journal.append(3, np.array([7, 8, 9]), np.array([1, 2, 3]), 2)
+    journal.append(3, np.array([], dtype=np.intp), np.array([], dtype=np.uint8), 2)
+    journal.close()
+
+    assert_records(read_journal(tmp_path / 'world.journal')[2], [(3, [7, 8, 9], [1, 2, 3], [2, 2, 2])])
+
+
+def test_torn_record_is_skipped(tmp_path):
+    file_path = tmp_path / 'world.journal'
+    write_journal(file_path).close()
+    full_size = os.path.getsize(file_path)
+    # The last record has one cell
+    last_record_size = _JOURNAL_RECORD.size + cell_index_dtype(SIZE).itemsize + 2
+
+    # Every cut inside the last record drops that record only
+    for cut in range(1, last_record_size):
+        write_journal(file_path).close()
+        with open(file_path, 'r+b') as file:
+            file.truncate(full_size - cut)
+        assert_records(read_journal(file_path)[2], RECORD_LIST[:-1])
+
+
+def test_reopened_journal_appends(tmp_path):
+    file_path = tmp_path / 'world.journal'
+    write_journal(file_path, RECORD_LIST[:1]).close()
+    write_journal(file_path, RECORD_LIST[1:]).close()
+
+    assert_records(read_journal(file_path)[2])
+
+
+def test_rotate_keeps_old_records(tmp_path):
+    file_path = tmp_path / 'world.journal'
+    old_file_path = tmp_path / 'world.journal.old'
+    journal = write_journal(file_path, RECORD_LIST[:1])
+    journal.rotate(old_file_path)
+    journal.append(*RECORD_LIST[1])
+    journal.rotate(old_file_path)
+    journal.append(*RECORD_LIST[2])
+    journal.close()
+
+    assert_records(read_journal(old_file_path)[2], RECORD_LIST[:2])
+    assert_records(read_journal(file_path)[2], RECORD_LIST[2:])
+
+
+def test_rejects_other_files(tmp_path):
+    write_world(tmp_path / 'world', [np.zeros(SIZE, dtype=np.uint8)], BLOCK_TABLE)
+    with pytest.raises(ValueError):
+        read_journal(tmp_path / 'world')
+
+
+@pytest.fixture
+def world_path(tmp_path, display) -> str:
+    from Scripts.Engine.Editor import block_dict, WORLD_LAYER_NAMES
+
+    block_table = {block.id: block.name for block in block_dict.values()}
+    file_path = str(tmp_path / 'world')
+    write_world(file_path, [np.zeros(SIZE, dtype=np.uint8) for _ in WORLD_LAYER_NAMES], block_table)
+    return file_path
+
+
+def open_editor(file_path: str):
+    from Scripts.Engine.Editor import WorldEditor
+
+    editor = WorldEditor(SIZE)
+    editor.load(file_path)
+    editor.open_journal(file_path)
+    return editor
+
+
+def layer_arrays(editor) -> list[np.ndarray]:
+    return [np.array(layer.index_position) for layer in editor.layers]
+
+
+def test_editor_replays_journal(world_path):
+    from Scripts.Engine.Editor import FindBlock
+
+    editor = open_editor(world_path)
+    editor.layers[0].apply_indices([(1, 2), (3, 4), (23, 39)], FindBlock('Rock'))
+    editor.layers[2].apply_indices([(5, 5)], FindBlock('Water'))
+    editor.layers[0].apply_indices([(3, 4)], None)
+    editor.update()
+    expected = layer_arrays(editor)
+    # Closed without saving, as after a crash
+    editor.close_journal()
+
+    editor = open_editor(world_path)
+    for layer, data in zip(layer_arrays(editor), expected):
+        np.testing.assert_array_equal(layer, data)
+    editor.close_journal()
+
+    # Replaying the merged journal again gives the same world
+    editor = open_editor(world_path)
+    for layer, data in zip(layer_arrays(editor), expected):
+        np.testing.assert_array_equal(layer, data)
+    editor.close_journal()
+
+
+def test_editor_replays_after_torn_record(world_path):
+    from Scripts.Engine.Editor import FindBlock
+
+    editor = open_editor(world_path)
+    editor.layers[0].apply_indices([(1, 1)], FindBlock('Sand'))
+    editor.update()
+    expected = layer_arrays(editor)
+    editor.layers[0].apply_indices([(2, 2), (3, 3)], FindBlock('Sand'))
+    editor.close_journal()
+
+    journal_path = world_path + JOURNAL_EXTENSION
+    with open(journal_path, 'r+b') as file:
+        file.truncate(os.path.getsize(journal_path) - 1)
+
+    editor = open_editor(world_path)
+    for layer, data in zip(layer_arrays(editor), expected):
+        np.testing.assert_array_equal(layer, data)
+    editor.close_journal()
+
+
+def test_editor_replays_unfinished_save(world_path):
+    from Scripts.Engine.Editor import FindBlock, block_dict
+
+    editor = open_editor(world_path)
+    editor.layers[0].apply_indices([(1, 1)], FindBlock('Grass'))
+    editor.update()
+    editor.close_journal()
+
+    # A save rotated the journal and stopped before writing the world file, then an edit was journaled
+    journal_path = world_path + JOURNAL_EXTENSION
+    os.replace(journal_path, journal_path + '.old')
+    journal = WorldJournal(journal_path, SIZE, {block.id: block.name for block in block_dict.values()})
+    journal.append(0, np.array([1 * SIZE[1] + 1]), np.array([FindBlock('Grass').id]), FindBlock('Water').id)
+    journal.close()
+
+    # The old records are replayed first
+    editor = open_editor(world_path)
+    assert editor.layers[0].index_position[1, 1] == FindBlock('Water').id
+    assert np.count_nonzero(editor.layers[0].index_position) == 1
+    assert not os.path.exists(journal_path + '.old')
+    editor.close_journal()
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+
+SIZE: tuple[int, int] = (48, 40)
+
+
+@pytest.fixture
+def editor_module(display, monkeypatch):
+    import Scripts.Engine.Editor as editor_module
+
+    # Small worlds are paged too, so the save copies the working file
+    monkeypatch.setattr(editor_module, 'PAGED_WORLD_CELLS', 0)
+    return editor_module
+
+
+def test_paged_save_ignores_edits_during_copy(tmp_path, editor_module, monkeypatch):
+    editor = editor_module.WorldEditor(SIZE)
+    rock, sand = editor_module.FindBlock('Rock'), editor_module.FindBlock('Sand')
+    layer = editor.layers[1]
+    layer.apply_indices([(1, 1), (2, 2), (47, 39)], rock)
+    expected = [np.array(data.index_position) for data in editor.layers]
+
+    copyfile = editor_module.shutil.copyfile
+
+    def copy_while_editing(source, destination):
+        # Edited before and after the cells are copied
+        layer.apply_indices([(1, 1), (3, 3)], sand)
+        copyfile(source, destination)
+        layer.apply_indices([(2, 2), (1, 1)], None)
+
+    monkeypatch.setattr(editor_module.shutil, 'copyfile', copy_while_editing)
+    file_path = str(tmp_path / 'world')
+    assert editor.save(file_path)
+    editor.wait_save()
+
+    world_file = editor_module.read_world(file_path)
+    for data, layer_data in zip(world_file.layers, expected):
+        np.testing.assert_array_equal(data, layer_data)
+    assert layer.index_position[3, 3] == sand.id and layer.index_position[1, 1] == 0
+
+
+def test_failed_save_is_reported(tmp_path, editor_module, monkeypatch, capsys):
+    editor = editor_module.WorldEditor(SIZE)
+    editor.layers[0].apply_indices([(0, 0)], editor_module.FindBlock('Grass'))
+
+    def broken_write(*args, **kwargs):
+        raise ValueError('broken')
+
+    monkeypatch.setattr(editor_module, 'write_world', broken_write)
+    assert editor.save(str(tmp_path / 'world'))
+    editor.wait_save()
+
+    assert 'Save failed: ValueError: broken' in capsys.readouterr().out
+    assert editor.is_changed()
+    assert not os.path.exists(tmp_path / 'world')
@@ -0,0 +1,23 @@
+"""
+Start of every tool, imported before the game modules.
+The tools run from the project directory, where the image and manifest paths are relative to,
+and resolve their arguments from the directory they were called from.
+"""
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Kept in the environment, worker processes start in the project directory
+INVOCATION_DIR = os.environ.setdefault('WORLD_TOOLS_INVOCATION_DIR', os.getcwd())
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.chdir(PROJECT_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+
+def resolve(path: str) -> str:
+    """
+    :param path: Path given to the tool
+    :return: Path relative to the directory the tool was called from, an absolute path as-is
+    """
+    return os.path.join(INVOCATION_DIR, path)
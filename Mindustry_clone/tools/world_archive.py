@@ -0,0 +1,125 @@
+"""
+Convert saved worlds into compressed world archives and compare the formats.
+
+    python tools/world_archive.py convert Data/Save/world_editor_saved_1 --codec zlib
+    python tools/world_archive.py report Data/Save/world_editor_saved_1 --repeat 5 --level zstd=19 --level zlib=9
+
+Inputs can be CSV saves, binary world files or world archives.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from tool_setup import INVOCATION_DIR, resolve
+from Scripts.Setting.BlockSetting import *
+from Scripts.Data.WorldFile import *
+from Scripts.Data.WorldArchive import *
+import numpy as np
+
+REGION_SIZE: int = 64  # Cells per side of the region read by the report
+
+
+BLOCK_TABLE: dict[int, str] = {block.id: block.name for block in block_dict.values()}
+
+
+def codec_level(text: str) -> tuple[str, int]:
+    """
+    Parse a 'CODEC=LEVEL' argument, levels differ from a codec to another.
+    """
+    codec, _, level = text.partition('=')
+    if codec not in available_codecs() or not level.lstrip('-').isdigit():
+        raise argparse.ArgumentTypeError(f'Expected CODEC=LEVEL with one of {available_codecs()}, got \'{text}\'.')
+    return codec, int(level)
+
+
+def measure(function, repeat: int) -> float:
+    """
+    :return: Median seconds of the function
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def convert(args):
+    for input_path in args.inputs:
+        world_file = read_any(resolve(input_path), BLOCK_TABLE)
+        output_path = resolve(args.output) if args.output and len(args.inputs) == 1 \
+            else resolve(os.path.splitext(input_path)[0] + '.mwar')
+
+        write_archive(output_path, world_file.layers, world_file.block_table, args.codec, args.level)
+        print(f'{input_path} ({os.path.getsize(resolve(input_path))} bytes) -> '
+              f'{os.path.relpath(output_path, INVOCATION_DIR)} ({os.path.getsize(output_path)} bytes, {args.codec})')
+
+
+def report(args):
+    with tempfile.TemporaryDirectory(prefix='world_archive_') as temporary_dir:
+        report_files(args, temporary_dir)
+
+
+def report_files(args, temporary_dir: str):
+    width = max(len('input'), *(len(path) for path in args.inputs))
+    print(f'{"input":<{width}} {"format":<16} {"bytes":>12} {"write ms":>10} {"load ms":>10} {"region ms":>10}')
+
+    level_dict = dict(args.level)
+    for input_path in args.inputs:
+        source_path = resolve(input_path)
+        world_file = read_any(source_path, BLOCK_TABLE)
+        size = world_file.size
+        region = (size[0] // 2 - REGION_SIZE // 2, size[1] // 2 - REGION_SIZE // 2, REGION_SIZE, REGION_SIZE)
+        row_list = []
+
+        if not is_world_archive(source_path) and not is_world_file(source_path):
+            row_list.append(('csv', os.path.getsize(source_path), None,
+                             measure(lambda: read_csv(source_path, block_id_dtype(max(block_dict))), args.repeat), None))
+
+        world_path = os.path.join(temporary_dir, 'world')
+        write_time = measure(lambda: write_world(world_path, world_file.layers, world_file.block_table), args.repeat)
+        row_list.append(('world file', os.path.getsize(world_path), write_time,
+                         measure(lambda: [np.array(layer) for layer in read_world(world_path).layers], args.repeat),
+                         None))
+
+        for codec in args.codecs:
+            archive_path = os.path.join(temporary_dir, f'world_{codec}.mwar')
+            write_time = measure(lambda: write_archive(archive_path, world_file.layers, world_file.block_table,
+                                                       codec, level_dict.get(codec)), args.repeat)
+            row_list.append((f'archive {codec}', os.path.getsize(archive_path), write_time,
+                             measure(lambda: WorldArchive(archive_path).read(), args.repeat),
+                             measure(lambda: WorldArchive(archive_path).read_region(*region), args.repeat)))
+
+        for name, file_size, write_time, load_time, region_time in row_list:
+            cells = [f'{t * 1000:10.2f}' if t is not None else f'{"-":>10}' for t in (write_time, load_time, region_time)]
+            print(f'{input_path:<{width}} {name:<16} {file_size:>12} {" ".join(cells)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert saved worlds into compressed world archives.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help='Write a world archive next to each input')
+    convert_parser.add_argument('inputs', nargs='+', help='CSV saves, world files or world archives')
+    convert_parser.add_argument('-o', '--output', help='Output file path, only with one input')
+    convert_parser.add_argument('--codec', choices=available_codecs(), default=DEFAULT_CODEC, help='Compression codec')
+    convert_parser.add_argument('--level', type=int, help='Compression level, the codec default if omitted')
+    convert_parser.set_defaults(function=convert)
+
+    report_parser = subparsers.add_parser('report', help='Compare the size and load time of every format')
+    report_parser.add_argument('inputs', nargs='+', help='CSV saves, world files or world archives')
+    report_parser.add_argument('--codecs', nargs='+', choices=available_codecs(), default=available_codecs(),
+                               help='Codecs to compare')
+    report_parser.add_argument('--level', type=codec_level, action='append', default=[], metavar='CODEC=LEVEL',
+                               help='Compression level of one codec, repeatable, the codec default for the others')
+    report_parser.add_argument('--repeat', type=int, default=3, help='Runs per measure')
+    report_parser.set_defaults(function=report)
+
+    args = parser.parse_args()
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main()
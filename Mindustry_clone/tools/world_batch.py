@@ -0,0 +1,253 @@
+"""
+Process many saved worlds without the editor window, one process per map.
+
+    python tools/world_batch.py Data/Save/*.csv --validate
+    python tools/world_batch.py maps/*.mwar --resize 256 256 --format world --output-dir out
+    python tools/world_batch.py maps/* --fill 0 0 Water --render --tile-size 8 --output-dir previews
+
+Inputs can be CSV saves, binary world files or world archives. The steps run in this order:
+validate, resize, fill, convert (--format) and render (--render).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from tool_setup import INVOCATION_DIR, resolve
+from Scripts.BrushTool.BrushSetting import *
+from Scripts.BrushTool.BrushSetting import _bucket_fill
+
+OUTPUT_EXTENSION: dict[str, str] = {'world': '', 'archive': '.mwar', 'csv': '.csv'}
+BLOCK_TABLE: dict[int, str] = {block.id: block.name for block in block_dict.values()}
+
+
+def to_layers(world_file: WorldFile) -> list[Layer]:
+    """
+    :return: Layers of the world file without undo history, block ids converted to the current ids
+    """
+    layers = []
+    for i, data in enumerate(world_file.layers):
+        name = WORLD_LAYER_NAMES[i] if i < len(WORLD_LAYER_NAMES) else f'Layer {i}'
+        layer = Layer(world_file.size, name, history=None)
+        layer.load_array(RemapBlockId(data, world_file.block_table))
+        layers.append(layer)
+    return layers
+
+
+def validate(world_file: WorldFile, layers: list[Layer]) -> dict:
+    """
+    Check the layer count and the block ids, and count the blocks of every layer.
+
+    :param world_file: World file as read
+    :param layers: Layers of the world file
+    :return: Problems and block counts by layer name
+    """
+    problem_list = []
+    if len(layers) > len(WORLD_LAYER_NAMES):
+        problem_list.append(f'{len(layers)} layers, the editor has {len(WORLD_LAYER_NAMES)}')
+
+    # Ids unknown to the file or to the editor become empty cells when loaded
+    known_names = {block.name for block in block_dict.values()}
+    for i, data in enumerate(world_file.layers):
+        ids, counts = np.unique(data, return_counts=True)
+        unknown = {int(block_id): int(count) for block_id, count in zip(ids, counts)
+                   if block_id and world_file.block_table.get(int(block_id)) not in known_names}
+        if unknown:
+            problem_list.append(f'layer {i} has unknown block ids {unknown}')
+
+    count_dict = {}
+    for layer in layers:
+        ids, counts = np.unique(layer.index_position, return_counts=True)
+        count_dict[layer.name] = {block_name(int(block_id)): int(count) for block_id, count in zip(ids, counts)}
+    return {'problems': problem_list, 'blocks': count_dict}
+
+
+def resize(layers: list[Layer], size: tuple[int, int]) -> list[Layer]:
+    """
+    Crop or pad every layer from its top left corner.
+
+    :param layers: Layers
+    :param size: New world size
+    :return: New layers
+    """
+    resized_list = []
+    for layer in layers:
+        resized = Layer(size, layer.name, history=None)
+        w, h = min(size[0], layer.index_position.shape[0]), min(size[1], layer.index_position.shape[1])
+        resized.index_position[:w, :h] = layer.index_position[:w, :h]
+        resized_list.append(resized)
+    return resized_list
+
+
+def fill(layer: Layer, index: tuple[int, int], block: Block | None) -> int:
+    """
+    Bucket fill like the 'fill' brush.
+
+    :param layer: Layer
+    :param index: Cell index the fill starts from
+    :param block: Block or None to clear
+    :return: Number of changed cells
+    """
+    if not (0 <= index[0] < layer.index_position.shape[0] and 0 <= index[1] < layer.index_position.shape[1]):
+        raise IndexError(f'Fill index {index} is outside of the world size {layer.index_position.shape}!')
+
+    mask = _bucket_fill(layer.index_position, index)
+    changed = int(np.count_nonzero(mask & (layer.index_position != (0 if block is None else block.id))))
+    layer.apply_mask(mask, block)
+    return changed
+
+
+def render(layers: list[Layer], file_path, tile_size: int):
+    """
+    Render every layer, terrain first, into a PNG image.
+
+    :param layers: Layers
+    :param file_path: PNG file path
+    :param tile_size: Tile size in pixels
+    """
+    size = layers[0].index_position.shape
+    surface = pygame.Surface((size[0] * tile_size, size[1] * tile_size), pygame.SRCALPHA)
+    for layer in layers:
+        layer.render(surface, tile_size)
+    pygame.image.save(surface, file_path)
+
+
+def block_name(block_id: int) -> str:
+    block = block_dict.get(block_id)
+    return 'None' if not block_id else block.name if block is not None else str(block_id)
+
+
+def output_path(input_path: str, output_dir: str | None, extension: str) -> str:
+    name = os.path.splitext(os.path.basename(input_path))[0] + extension
+    directory = resolve(output_dir) if output_dir else os.path.dirname(resolve(input_path))
+    path = os.path.join(directory, name)
+    if os.path.abspath(path) == os.path.abspath(resolve(input_path)):
+        raise FileExistsError(f'Output \'{path}\' would overwrite the input, use \'--output-dir\'.')
+    return path
+
+
+def process(input_path: str, args: argparse.Namespace) -> dict:
+    """
+    Run the selected steps on one map. Runs in a worker process.
+
+    :param input_path: Input path relative to the invocation directory
+    :param args: Parsed arguments
+    :return: Result of every step, 'error' if a step failed
+    """
+    start = time.perf_counter()
+    result = {'input': input_path}
+    try:
+        world_file = read_any(resolve(input_path), BLOCK_TABLE)
+        layers = to_layers(world_file)
+        result['size'] = list(layers[0].index_position.shape)
+        result['layers'] = len(layers)
+
+        if args.validate:
+            result.update(validate(world_file, layers))
+
+        if args.resize:
+            layers = resize(layers, tuple(args.resize))
+            result['size'] = list(args.resize)
+
+        if args.fill:
+            x, y, name = args.fill
+            block = None if name == 'None' else FindBlock(name)
+            if args.layer is not None:
+                layer_index = args.layer
+            else:
+                # Blocks are placed on the layer of their manifest, like the editor brushes
+                layer_index = 0 if block is None else WORLD_LAYER_NAMES.index(block.layer)
+            if layer_index >= len(layers):
+                layers += [Layer(layers[0].index_position.shape, WORLD_LAYER_NAMES[i], history=None)
+                           for i in range(len(layers), layer_index + 1)]
+            result['filled'] = fill(layers[layer_index], (int(x), int(y)), block)
+            result['layers'] = len(layers)
+
+        if args.format:
+            path = output_path(input_path, args.output_dir, OUTPUT_EXTENSION[args.format])
+            data_list = [layer.index_position for layer in layers]
+            if args.format == 'world':
+                write_world(path, data_list, BLOCK_TABLE)
+            elif args.format == 'archive':
+                write_archive(path, data_list, BLOCK_TABLE, args.codec)
+            else:
+                write_csv(path, data_list[0])
+            result['output'] = os.path.relpath(path, INVOCATION_DIR)
+
+        if args.render:
+            path = output_path(input_path, args.output_dir, '.png')
+            render(layers, path, args.tile_size)
+            result['image'] = os.path.relpath(path, INVOCATION_DIR)
+    except Exception as error:
+        result['error'] = f'{type(error).__name__}: {error}'
+
+    result['seconds'] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def print_result(result: dict):
+    if 'error' in result:
+        print(f'{result["input"]}: FAILED {result["error"]}')
+        return
+
+    line = f'{result["input"]}: {result["size"][0]}x{result["size"][1]}, {result["layers"]} layers'
+    if 'filled' in result:
+        line += f', filled {result["filled"]} cells'
+    for key in ('output', 'image'):
+        if key in result:
+            line += f' -> {result[key]}'
+    print(f'{line} ({result["seconds"] * 1000:.0f} ms)')
+
+    for problem in result.get('problems', []):
+        print(f'    problem: {problem}')
+    for name, count_dict in result.get('blocks', {}).items():
+        print(f'    {name}: ' + ', '.join(f'{block} {count}' for block, count in count_dict.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load, validate, resize, fill, convert and render saved worlds.')
+    parser.add_argument('inputs', nargs='+', help='CSV saves, world files or world archives')
+    parser.add_argument('--validate', action='store_true', help='Report unknown block ids and block counts')
+    parser.add_argument('--resize', nargs=2, type=int, metavar=('WIDTH', 'HEIGHT'),
+                        help='Crop or pad the world from its top left corner')
+    parser.add_argument('--fill', nargs=3, metavar=('X', 'Y', 'BLOCK'),
+                        help='Bucket fill from the cell with the block name, \'None\' clears')
+    parser.add_argument('--layer', type=int, choices=range(len(WORLD_LAYER_NAMES)),
+                        help='Layer index filled by \'--fill\', the layer of the block if omitted, '
+                             'the terrain layer for \'None\'')
+    parser.add_argument('--format', choices=list(OUTPUT_EXTENSION), help='Write the world in this format')
+    parser.add_argument('--codec', choices=available_codecs(), default=DEFAULT_CODEC, help='Archive codec')
+    parser.add_argument('--render', action='store_true', help='Render the world into a PNG image')
+    parser.add_argument('--tile-size', type=int, default=4, help='Tile size of the rendered image in pixels')
+    parser.add_argument('--output-dir', help='Output directory, next to each input if omitted')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    block_names = [block.name for block in block_dict.values()]
+    if args.fill and args.fill[2] != 'None' and args.fill[2] not in block_names:
+        parser.error(f'Unknown block \'{args.fill[2]}\', use one of {block_names} or \'None\'.')
+    if args.output_dir:
+        os.makedirs(resolve(args.output_dir), exist_ok=True)
+
+    # Spawned workers import a fresh pygame instead of sharing the parent SDL state
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(min(args.workers, len(args.inputs)), mp_context=context) as executor:
+        result_list = list(executor.map(process, args.inputs, [args] * len(args.inputs)))
+
+    for result in result_list:
+        print_result(result)
+    failed = sum('error' in result for result in result_list)
+    print(f'{len(result_list) - failed} done, {failed} failed')
+
+    if args.json:
+        with open(resolve(args.json), 'w') as file:
+            json.dump(result_list, file, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()